@@ -0,0 +1,21 @@
+# Resolved on first use so that `python -m approval_teams` and the wrapper
+# scripts don't pay for MSAL and the Graph client on runs with nothing to do.
+_EXPORTS = {
+    "ApprovalClient": ".client",
+    "SOURCES": ".sources",
+    "FlyTicketsSource": ".sources",
+    "TicketSource": ".sources",
+    "UniformRequestsSource": ".sources",
+    "build_source": ".sources",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,147 @@
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+CREATED = "created"
+RESOLVED = "resolved"
+RESPONDED = "responded"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS approvals (
+    source TEXT NOT NULL,
+    ticket_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    approval_id TEXT,
+    desired_status TEXT,
+    response TEXT,
+    created_at TEXT,
+    responded_at TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (source, ticket_id)
+);
+CREATE TABLE IF NOT EXISTS ticket_snapshots (
+    source TEXT NOT NULL,
+    ticket_id TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    seen_at TEXT NOT NULL,
+    PRIMARY KEY (source, ticket_id)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    source TEXT PRIMARY KEY,
+    watermark TEXT,
+    synced_at TEXT NOT NULL
+);
+"""
+
+def utc_now():
+
+    return datetime.now(timezone.utc).isoformat()
+
+class ApprovalStore:
+
+    def __init__(self, path):
+
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript(SCHEMA)
+
+    def get(self, source, ticket_id):
+
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM approvals WHERE source = ? AND ticket_id = ?",
+                (source, str(ticket_id))
+            ).fetchone()
+        return dict(row) if row else None
+
+    def load(self, source):
+
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM approvals WHERE source = ?", (source,)).fetchall()
+        return {row["ticket_id"]: dict(row) for row in rows}
+
+    def mark_created(self, source, ticket_id, desired_status, created_at, approval_id=None):
+
+        state = RESOLVED if approval_id else CREATED
+        with self.lock:
+            self.conn.execute(
+                """
+                INSERT INTO approvals (source, ticket_id, state, approval_id, desired_status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source, ticket_id) DO UPDATE SET
+                    state = excluded.state,
+                    approval_id = excluded.approval_id,
+                    desired_status = excluded.desired_status,
+                    created_at = excluded.created_at,
+                    updated_at = excluded.updated_at
+                """,
+                (source, str(ticket_id), state, approval_id, desired_status, created_at.isoformat(), utc_now())
+            )
+
+    def mark_resolved(self, source, ticket_id, approval_id):
+
+        with self.lock:
+            self.conn.execute(
+                "UPDATE approvals SET state = ?, approval_id = ?, updated_at = ? WHERE source = ? AND ticket_id = ?",
+                (RESOLVED, approval_id, utc_now(), source, str(ticket_id))
+            )
+
+    def mark_responded(self, source, ticket_id, response):
+
+        now = utc_now()
+        with self.lock:
+            self.conn.execute(
+                "UPDATE approvals SET state = ?, response = ?, responded_at = ?, updated_at = ? WHERE source = ? AND ticket_id = ?",
+                (RESPONDED, response, now, now, source, str(ticket_id))
+            )
+
+    def forget(self, source, ticket_id):
+
+        with self.lock:
+            self.conn.execute("DELETE FROM approvals WHERE source = ? AND ticket_id = ?", (source, str(ticket_id)))
+
+    def load_snapshots(self, source):
+
+        with self.lock:
+            rows = self.conn.execute("SELECT ticket_id, digest FROM ticket_snapshots WHERE source = ?", (source,)).fetchall()
+        return {row["ticket_id"]: row["digest"] for row in rows}
+
+    def save_snapshots(self, source, digests):
+
+        now = utc_now()
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                """
+                INSERT INTO ticket_snapshots (source, ticket_id, digest, seen_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (source, ticket_id) DO UPDATE SET digest = excluded.digest, seen_at = excluded.seen_at
+                """,
+                [(source, str(ticket_id), digest, now) for ticket_id, digest in digests.items()]
+            )
+            self.conn.execute("COMMIT")
+
+    def get_watermark(self, source):
+
+        with self.lock:
+            row = self.conn.execute("SELECT watermark FROM sync_state WHERE source = ?", (source,)).fetchone()
+        return row["watermark"] if row else None
+
+    def set_watermark(self, source, watermark):
+
+        with self.lock:
+            self.conn.execute(
+                """
+                INSERT INTO sync_state (source, watermark, synced_at) VALUES (?, ?, ?)
+                ON CONFLICT (source) DO UPDATE SET watermark = excluded.watermark, synced_at = excluded.synced_at
+                """,
+                (source, None if watermark is None else str(watermark), utc_now())
+            )
+
+    def close(self):
+
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import quote
+
+from .graph_batch import GraphBatch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 3600
+
+def load_approver_routes(path):
+
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def approver_email_for(ticket, routes, default_email):
+
+    # routes look like {"technician": {"Jane Doe": "lead@contoso.com"}, "requestType": {...}};
+    # the first field whose value has an entry wins.
+    for field, mapping in routes.items():
+        if field == "default" or not isinstance(mapping, dict):
+            continue
+        value = ticket.get(field)
+        if value is not None and str(value) in mapping:
+            return mapping[str(value)]
+    return routes.get("default") or default_email
+
+class ApproverDirectory:
+
+    def __init__(self, graph, ttl=DEFAULT_TTL_SECONDS, cache_path=None):
+
+        self.graph = graph
+        self.ttl = ttl
+        self.cache_path = cache_path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.refresh_thread = None
+        self.load()
+
+    def load(self):
+
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable approver cache %s: %s", self.cache_path, e)
+            return
+        now = time.time()
+        with self.lock:
+            self.entries = {email: entry for email, entry in entries.items() if entry["fetched_at"] + self.ttl > now}
+
+    def save(self):
+
+        if not self.cache_path:
+            return
+        with self.lock:
+            data = json.dumps(self.entries)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, self.cache_path)
+
+    def fresh_entry(self, email, now):
+
+        entry = self.entries.get(email)
+        if entry and entry["fetched_at"] + self.ttl > now:
+            return entry
+        self.entries.pop(email, None)
+        return None
+
+    def resolve(self, email):
+
+        approvers, failures = self.resolve_many([email])
+        if failures:
+            raise Exception(f"Failed to get user details: {failures[email.lower()]}")
+        return approvers[email.lower()]
+
+    def resolve_many(self, emails):
+
+        # Returns ({email: (id, displayName)}, {email: error}); one unknown
+        # address does not stop the others from resolving.
+        emails = {email.lower() for email in emails if email}
+        now = time.time()
+        with self.lock:
+            missing = [email for email in emails if not self.fresh_entry(email, now)]
+        failures = self.fetch(missing) if missing else {}
+        with self.lock:
+            approvers = {email: (self.entries[email]["id"], self.entries[email]["displayName"]) for email in emails if email not in failures}
+        return approvers, failures
+
+    def fetch(self, emails):
+
+        if len(emails) == 1:
+            response = self.graph.get(f"/v1.0/users/{quote(emails[0], safe='@')}")
+            results = {emails[0]: {"status": response.status_code, "body": response.json() if response.status_code == 200 else None, "text": response.text}}
+        else:
+            batch = GraphBatch(self.graph, version="v1.0")
+            request_ids = {email: batch.add("GET", f"/users/{quote(email, safe='@')}?$select=id,displayName") for email in emails}
+            sent = batch.execute()
+            results = {email: {**sent[request_id], "text": sent[request_id]["body"]} for email, request_id in request_ids.items()}
+
+        now = time.time()
+        failures = {}
+        with self.lock:
+            for email, result in results.items():
+                if result["status"] == 200:
+                    user = result["body"]
+                    self.entries[email] = {"id": user["id"], "displayName": user.get("displayName", email), "fetched_at": now}
+                else:
+                    failures[email] = f"{email}: {result['status']} - {result['text']}"
+        if len(failures) < len(results):
+            self.save()
+        return failures
+
+    def refresh_expiring(self, margin):
+
+        now = time.time()
+        with self.lock:
+            expiring = [email for email, entry in self.entries.items() if entry["fetched_at"] + self.ttl - margin <= now]
+        if expiring:
+            for error in self.fetch(expiring).values():
+                logger.warning("Approver refresh failed for %s", error)
+
+    def start_background_refresh(self, interval=None):
+
+        interval = interval or max(60, self.ttl / 4)
+
+        def refresh_loop():
+            while not self.stop_event.wait(interval):
+                try:
+                    self.refresh_expiring(margin=interval * 2)
+                except Exception as e:
+                    logger.warning("Approver refresh failed: %s", e)
+
+        self.refresh_thread = threading.Thread(target=refresh_loop, name="approver-refresh", daemon=True)
+        self.refresh_thread.start()
+
+    def stop(self):
+
+        self.stop_event.set()
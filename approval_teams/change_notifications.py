@@ -0,0 +1,204 @@
+import json
+import logging
+import queue
+import secrets
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from dateutil.parser import parse
+
+from .metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+APPROVAL_RESOURCE = "solutions/approval/approvalItems"
+DEFAULT_SUBSCRIPTION_LIFETIME = 3600
+
+def new_client_state():
+
+    return secrets.token_urlsafe(24)
+
+def send_reply(handler, status, body=b"", content_type="text/plain"):
+
+    handler.send_response(status)
+    handler.send_header("Content-Type", content_type)
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+class NotificationReceiver:
+
+    def __init__(self, on_notifications, client_state, host="127.0.0.1", port=0):
+
+        self.on_notifications = on_notifications
+        self.client_state = client_state
+        self.queue = queue.Queue()
+        receiver = self
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+
+                length = int(self.headers.get("Content-Length") or 0)
+                raw_body = self.rfile.read(length) if length else b""
+                query = parse_qs(urlsplit(self.path).query)
+
+                # Graph checks a new notificationUrl by posting a validationToken
+                # that has to be echoed back as text/plain within 10 seconds.
+                if "validationToken" in query:
+                    send_reply(self, 200, query["validationToken"][0].encode("utf-8"))
+                    return
+
+                try:
+                    notifications = json.loads(raw_body).get("value", [])
+                except (ValueError, AttributeError):
+                    send_reply(self, 400)
+                    return
+                # Acknowledge first; Graph retries and eventually drops slow endpoints.
+                send_reply(self, 202)
+                receiver.accept(notifications)
+
+            def log_message(self, format, *args):
+
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), WebhookHandler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.threads = []
+
+    def accept(self, notifications):
+
+        for notification in notifications:
+            if not secrets.compare_digest(str(notification.get("clientState") or ""), self.client_state):
+                METRICS.inc("change_notifications_total", outcome="rejected")
+                logger.warning("Ignoring change notification with unexpected clientState for %s", notification.get("resource"))
+                continue
+            METRICS.inc("change_notifications_total", outcome="accepted")
+            self.queue.put(notification)
+
+    def process_queue(self):
+
+        while True:
+            notification = self.queue.get()
+            if notification is None:
+                return
+            notifications = [notification]
+            while True:
+                try:
+                    notification = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if notification is None:
+                    self.queue.put(None)
+                    break
+                notifications.append(notification)
+            try:
+                self.on_notifications(notifications)
+            except Exception as e:
+                logger.error("Failed to process %d change notifications: %s", len(notifications), e)
+
+    def start(self):
+
+        for target, name in ((self.server.serve_forever, "webhook"), (self.process_queue, "webhook-worker")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logger.info("Listening for change notifications on port %s", self.port)
+
+    def stop(self):
+
+        self.server.shutdown()
+        self.queue.put(None)
+
+class ApprovalSubscription:
+
+    def __init__(self, graph, notification_url, client_state, resource=APPROVAL_RESOURCE, change_type="created,updated", lifetime=DEFAULT_SUBSCRIPTION_LIFETIME, version="beta"):
+
+        self.graph = graph
+        self.notification_url = notification_url
+        self.client_state = client_state
+        self.resource = resource
+        self.change_type = change_type
+        self.lifetime = lifetime
+        self.version = version
+        self.id = None
+        self.expires = None
+        self.lock = threading.Lock()
+
+    @property
+    def active(self):
+
+        return self.id is not None and self.expires > datetime.now(timezone.utc)
+
+    def expiration(self):
+
+        return (datetime.now(timezone.utc) + timedelta(seconds=self.lifetime)).isoformat().replace("+00:00", "Z")
+
+    def create(self):
+
+        payload = {
+            "changeType": self.change_type,
+            "notificationUrl": self.notification_url,
+            "resource": self.resource,
+            "expirationDateTime": self.expiration(),
+            "clientState": self.client_state
+        }
+        response = self.graph.post(f"/{self.version}/subscriptions", json=payload, timeout=30)
+        if response.status_code != 201:
+            raise Exception(f"Failed to create subscription for {self.resource}: {response.status_code} - {response.text}")
+        subscription = response.json()
+        self.id = subscription["id"]
+        self.expires = parse(subscription["expirationDateTime"]).astimezone(timezone.utc)
+        logger.info("Subscribed to %s changes until %s (subscription %s)", self.resource, self.expires, self.id)
+
+    def renew(self):
+
+        response = self.graph.patch(f"/{self.version}/subscriptions/{self.id}", json={"expirationDateTime": self.expiration()})
+        if response.status_code == 404:
+            logger.warning("Subscription %s no longer exists; creating a new one", self.id)
+            self.id = None
+            self.create()
+            return
+        if response.status_code != 200:
+            raise Exception(f"Failed to renew subscription {self.id}: {response.status_code} - {response.text}")
+        self.expires = parse(response.json()["expirationDateTime"]).astimezone(timezone.utc)
+
+    def ensure(self):
+
+        with self.lock:
+            try:
+                if self.id is None:
+                    self.create()
+                elif self.expires - datetime.now(timezone.utc) < timedelta(seconds=self.lifetime / 2):
+                    self.renew()
+                return True
+            except Exception as e:
+                logger.warning("Change notifications unavailable, falling back to polling: %s", e)
+                return False
+
+    def delete(self):
+
+        with self.lock:
+            if self.id is None:
+                return
+            try:
+                self.graph.delete(f"/{self.version}/subscriptions/{self.id}")
+            except requests.exceptions.RequestException as e:
+                logger.warning("Failed to delete subscription %s: %s", self.id, e)
+            self.id = None
+
+    def start_renewal(self, stop_event, interval=None):
+
+        interval = interval or min(300, self.lifetime / 4)
+
+        def renewal_loop():
+            while not stop_event.wait(interval):
+                self.ensure()
+
+        thread = threading.Thread(target=renewal_loop, name="subscription-renewal", daemon=True)
+        thread.start()
+        return thread
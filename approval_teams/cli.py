@@ -0,0 +1,370 @@
+import argparse
+import logging
+import threading
+
+from . import config
+from .approval_store import ApprovalStore, RESPONDED
+from .approver_directory import approver_email_for, load_approver_routes
+from .daemon import run_daemon
+from .delta_sync import DeltaSync
+from .http_client import DEFAULT_POOL_SIZE
+from .logs import configure_logging, flush_logs, ticket_context, ticket_fields
+from .metrics import METRICS
+from .scheduling import load_schedule
+from .sources import SOURCES, build_source
+from .ticket_pipeline import new_result, print_summary, run_tickets
+from .work_queue import DEAD, QUEUED, WorkQueue
+
+logger = logging.getLogger(__name__)
+
+# MSAL, the Graph client and the webhook server are imported only once a run
+# actually has Graph work, so "nothing to do" runs stay cheap.
+
+def setup(source):
+
+    store = ApprovalStore(config.APPROVAL_STORE_PATH)
+    policy = load_schedule(config.SCHEDULE_PATH, source.name) if config.SCHEDULE_PATH else None
+    return {
+        "source": source,
+        "store": store,
+        "routes": load_approver_routes(config.APPROVER_ROUTES_PATH),
+        "queue": WorkQueue(
+            store, config.QUEUE_LEASE_SECONDS, config.QUEUE_MAX_ATTEMPTS, config.QUEUE_RETRY_DELAY,
+            policy=policy, deadline_horizon=config.SCHEDULE_DEADLINE_HORIZON
+        )
+    }
+
+def connect(context):
+
+    if "client" in context:
+        return context["client"]
+
+    from .client import ApprovalClient
+
+    pool_size = max(config.MAX_CONCURRENT_TICKETS, DEFAULT_POOL_SIZE)
+    client = ApprovalClient.connect(context["source"], context["store"], pool_size=pool_size)
+
+    with METRICS.phase("approver_lookup"):
+        approver_id, approver_display_name = client.directory.resolve(config.APPROVER_EMAIL)
+    logger.info("Found user details for %s: ID=%s, DisplayName=%s", config.APPROVER_EMAIL, approver_id, approver_display_name)
+
+    context["client"] = client
+    return client
+
+def find_work(context, sync=None):
+
+    source = context["source"]
+    with METRICS.phase("ticket_fetch"):
+        tickets = source.fetch()
+    if not tickets:
+        logger.info("No %s found.", source.plural)
+        return None
+
+    if sync:
+        total = len(tickets)
+        tickets = sync.changed(tickets)
+        logger.info("Incremental sync: %d of %d %s are new or changed since the last run", len(tickets), total, source.plural)
+        if not tickets:
+            # Nothing new to queue, but earlier work may still be waiting in the queue.
+            return []
+
+    records = context["store"].load(source.name)
+
+    work = []
+    for ticket, desired_status, rule in source.decisions(tickets):
+        record = records.get(str(ticket["id"]))
+        if record and record["state"] == RESPONDED:
+            logger.info("Skipping %s ID %s: already responded %s on approval %s", source.noun, ticket["id"], record["response"], record["approval_id"])
+            continue
+        logger.info("Queueing %s ID %s: %s with desired status: %s (rule %s)", source.noun, ticket["id"], ticket["title"], desired_status, rule)
+        work.append((ticket, desired_status))
+    return work
+
+def start_work(context, sync=None):
+
+    # Fetches, decides and queues; signs in to Graph only if there is
+    # something to claim. Returns False when the run has nothing to do.
+    source = context["source"]
+    work = find_work(context, sync) or []
+    if not work and not context["queue"].ready_count(source.name):
+        logger.info("No new work: every open %s is already handled and nothing is waiting to retry.", source.noun)
+        return False
+    connect(context)
+    context["queue"].enqueue(source.name, work)
+    return True
+
+def process_tickets(context, sync=None, stop_event=None):
+
+    results = process_work(context, stop_event) if start_work(context, sync) else []
+    if sync:
+        sync.commit(failed_ids=[r["id"] for r in results if r["error"] or not r["responded"]])
+    return results
+
+def process_work(context, stop_event=None):
+
+    results = []
+    while not (stop_event and stop_event.is_set()):
+        batch = process_next(context, stop_event)
+        if batch is None:
+            break
+        results.extend(batch)
+
+    finish_work(context, results)
+    return results
+
+def process_next(context, stop_event=None):
+
+    # One claim's worth of the most urgent tickets; None once nothing is ready.
+    claimed = context["queue"].claim(context["source"].name, config.QUEUE_CLAIM_SIZE)
+    if not claimed:
+        return None
+    return process_claimed(context, claimed, stop_event)
+
+def finish_work(context, results):
+
+    source = context["source"]
+    flush_logs()
+    print_summary(results)
+    counts = context["queue"].counts(source.name)
+    if counts.get(QUEUED) or counts.get(DEAD):
+        print(f"Work queue: {counts.get(QUEUED, 0)} waiting to retry, {counts.get(DEAD, 0)} dead-lettered")
+
+def process_claimed(context, claimed, stop_event=None):
+
+    source = context["source"]
+    queue = context["queue"]
+    attempts = {item["ticket"]["id"]: item["attempts"] for item in claimed}
+
+    def lease_lost(ticket_id):
+        METRICS.inc("work_queue_leases_lost_total")
+        logger.warning("Lease on %s ID %s expired and another worker has it now; leaving it to them", source.noun, ticket_id)
+
+    def fail(ticket_id, error):
+        status = queue.fail(source.name, ticket_id, attempts[ticket_id], error)
+        if status is None:
+            lease_lost(ticket_id)
+        elif status == DEAD:
+            METRICS.inc("work_queue_dead_letters_total")
+            logger.error("Giving up on %s ID %s after %d attempts: %s", source.noun, ticket_id, attempts[ticket_id], error)
+
+    try:
+        results = run_claimed(context, claimed, stop_event)
+    except Exception as e:
+        # claim() has already counted this attempt; fail the tickets so they
+        # retry after a backoff and a poison ticket is eventually dead-lettered
+        # instead of sitting leased until the lease runs out.
+        for item in claimed:
+            fail(item["ticket"]["id"], str(e))
+        raise
+
+    for result in results:
+        if result["responded"]:
+            if not queue.complete(source.name, result["id"]):
+                lease_lost(result["id"])
+        elif result["error"] == "Not started: shutting down":
+            queue.release(source.name, result["id"])
+        elif result["error"]:
+            fail(result["id"], result["error"])
+        elif result["approval_id"]:
+            fail(result["id"], f"response failed for approval {result['approval_id']}")
+        else:
+            fail(result["id"], "approval ID not found")
+    return results
+
+def run_claimed(context, claimed, stop_event=None):
+
+    client = context["client"]
+    source = context["source"]
+    queue = context["queue"]
+    records = client.store.load(source.name)
+    for item in list(claimed):
+        record = records.get(str(item["ticket"]["id"]))
+        if record and record["state"] == RESPONDED:
+            # Finished elsewhere (another worker, a change notification) since it was queued.
+            queue.complete(source.name, item["ticket"]["id"])
+            claimed.remove(item)
+    work = [(item["ticket"], item["desired_status"]) for item in claimed]
+
+    # Only tickets without an approval yet need their approver; one that can't
+    # be looked up fails its own tickets and the rest of the claim carries on.
+    emails = {ticket["id"]: approver_email_for(ticket, context["routes"], config.APPROVER_EMAIL) for ticket, _ in work if str(ticket["id"]) not in records}
+    with METRICS.phase("approver_lookup"):
+        directory_entries, lookup_failures = client.directory.resolve_many(emails.values())
+    approvers = {}
+    unresolved = []
+    for ticket, desired_status in list(work):
+        email = (emails.get(ticket["id"]) or "").lower()
+        if email in lookup_failures:
+            result = new_result(ticket, desired_status)
+            result["error"] = f"Failed to get user details: {lookup_failures[email]}"
+            logger.error("Cannot create approval for %s ID %s: %s", source.noun, ticket["id"], result["error"], extra=ticket_fields(source.name, ticket["id"]))
+            unresolved.append(result)
+            work.remove((ticket, desired_status))
+        elif ticket["id"] in emails:
+            approvers[ticket["id"]] = directory_entries[email]
+
+    def handle(ticket, desired_status):
+        with ticket_context(source.name, ticket["id"]):
+            record = client.store.get(source.name, ticket["id"])
+            if record:
+                return client.resume_approval(record, ticket, desired_status)
+            approver_id, approver_display_name = approvers[ticket["id"]]
+            return client.create_approval(approver_id, approver_display_name, ticket, desired_status)
+
+    with queue.heartbeat(source.name, [ticket["id"] for ticket, _ in work]):
+        if not work:
+            results = []
+        elif config.USE_GRAPH_BATCH:
+            results = client.process_tickets_batched(records, approvers, work)
+        else:
+            results = run_tickets(work, handle, max_workers=config.MAX_CONCURRENT_TICKETS, stop_event=stop_event)
+    return unresolved + results
+
+def reconcile_tickets(context, fix=False):
+
+    from .reconcile import cancel_duplicates, fix_store, print_reconcile_report, reconcile
+
+    client = connect(context)
+    source = context["source"]
+    with METRICS.phase("ticket_fetch"):
+        tickets = source.fetch()
+    decisions = {ticket["id"]: (ticket, desired_status) for ticket, desired_status, _ in source.decisions(tickets)}
+
+    with METRICS.phase("reconcile"):
+        report = reconcile(decisions, client.iter_approvals(), client.store.load(source.name), source.id_label)
+    flush_logs()
+    print_reconcile_report(report)
+    if not fix:
+        return report
+
+    fix_store(client.store, source.name, report)
+    cancelled = cancel_duplicates(client.graph, report)
+    logger.info("Updated %d local records and cancelled %d duplicate approvals", len(report["out_of_sync"]), cancelled)
+    if report["missing"]:
+        work = [(item["ticket"], item["desired_status"]) for item in report["missing"]]
+        context["queue"].enqueue(source.name, work)
+        process_work(context)
+    return report
+
+def start_subscription(context, stop_event):
+
+    from .change_notifications import ApprovalSubscription, NotificationReceiver, new_client_state
+
+    client = connect(context)
+    client_state = new_client_state()
+    receiver = NotificationReceiver(client.apply_approval_changes, client_state, config.NOTIFICATION_HOST, config.NOTIFICATION_PORT)
+    receiver.start()
+    notification_url = config.NOTIFICATION_URL or f"http://{config.NOTIFICATION_HOST}:{receiver.port}/"
+    subscription = ApprovalSubscription(client.graph, notification_url, client_state, lifetime=config.SUBSCRIPTION_LIFETIME)
+    subscription.ensure()
+    subscription.start_renewal(stop_event)
+    return receiver, subscription
+
+def check_for_work(context, sync=None):
+
+    source = context["source"]
+    work = find_work(context, sync) or []
+    ready = context["queue"].ready_count(source.name)
+    flush_logs()
+    print(f"{len(work)} new {source.plural} to process, {ready} queued for retry")
+    return 0 if work or ready else 1
+
+def report_metrics():
+
+    flush_logs()
+    METRICS.print_summary()
+    if config.METRICS_PATH:
+        METRICS.write(config.METRICS_PATH)
+        print(f"Metrics written to {config.METRICS_PATH}")
+
+def poll_tickets(context, sync, stop_event, subscription=None):
+
+    try:
+        if subscription is not None and not subscription.active:
+            connect(context).poll_approval_states()
+        return process_tickets(context, sync, stop_event)
+    finally:
+        if config.METRICS_PATH:
+            METRICS.write(config.METRICS_PATH)
+
+def run_sharded(args):
+
+    from .shards import load_shards, print_shard_summary, run_shards
+
+    shards = load_shards(args.shards)
+    if config.METRICS_PORT:
+        METRICS.serve(config.METRICS_PORT)
+
+    def poll(stop_event=None):
+        summaries = run_shards(shards, args.workers, incremental=args.daemon)
+        print_shard_summary(summaries)
+        if config.METRICS_PATH:
+            METRICS.write(config.METRICS_PATH)
+        return summaries
+
+    if args.daemon:
+        run_daemon(poll, args.interval, args.jitter)
+        return None
+    summaries = poll()
+    report_metrics()
+    return 1 if any(s["error"] for s in summaries) else None
+
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(prog="python -m approval_teams", description="Create Teams approvals for tickets from a ticket source.")
+    parser.add_argument("--source", choices=sorted(SOURCES), help="ticket source to read from")
+    parser.add_argument("--shards", help="JSON file of (tenant, source, approver) shards to run across worker processes instead of one --source")
+    parser.add_argument("--workers", type=int, default=config.SHARD_WORKERS, help="worker processes for --shards (default: one per CPU)")
+    parser.add_argument("--check", action="store_true", help="only check for new work without signing in to Graph; exit status 0 if there is work, 1 if not")
+    parser.add_argument("--daemon", action="store_true", help="keep running and poll for new tickets")
+    parser.add_argument("--interval", type=float, default=config.POLL_INTERVAL, help="seconds between polls in daemon mode")
+    parser.add_argument("--jitter", type=float, default=config.POLL_JITTER, help="random fraction added to or removed from each interval")
+    parser.add_argument("--subscribe", action="store_true", help="daemon mode that also receives Graph change notifications for approval items")
+    parser.add_argument("--reconcile", action="store_true", help="diff open tickets against existing Teams approvals in one pass and report")
+    parser.add_argument("--requeue-dead", action="store_true", help="move dead-lettered tickets back onto the work queue before processing")
+    parser.add_argument("--fix", action="store_true", help="with --reconcile: repair local records, cancel duplicates and create missing approvals")
+    args = parser.parse_args(argv)
+    if not args.source and not args.shards:
+        parser.error("one of --source or --shards is required")
+    return args
+
+def main(argv=None):
+
+    args = parse_args(argv)
+    configure_logging()
+    try:
+        if args.shards:
+            return run_sharded(args)
+        source = build_source(args.source)
+        context = setup(source)
+        store = context["store"]
+        if args.check:
+            return check_for_work(context, DeltaSync(store, source.name) if config.INCREMENTAL_SYNC else None)
+        if config.METRICS_PORT:
+            METRICS.serve(config.METRICS_PORT)
+        if args.requeue_dead:
+            logger.info("Requeued %d dead-lettered %s", context["queue"].requeue_dead(source.name), source.plural)
+
+        if args.reconcile:
+            reconcile_tickets(context, fix=args.fix)
+            report_metrics()
+        elif args.daemon or args.subscribe:
+            sync = DeltaSync(store, source.name)
+            connect(context).directory.start_background_refresh()
+            stop_event = threading.Event()
+            receiver, subscription = start_subscription(context, stop_event) if args.subscribe else (None, None)
+            try:
+                run_daemon(lambda stop_event: poll_tickets(context, sync, stop_event, subscription), args.interval, args.jitter, stop_event)
+            finally:
+                if subscription:
+                    subscription.delete()
+                    receiver.stop()
+        else:
+            sync = DeltaSync(store, source.name) if config.INCREMENTAL_SYNC else None
+            process_tickets(context, sync)
+            report_metrics()
+            print(f"All {source.plural} processed.")
+
+    except Exception as e:
+        logger.error("Error: %s", e)
+        return 2
@@ -0,0 +1,413 @@
+import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+import requests
+from dateutil.parser import parse
+
+from . import config
+from .approval_store import RESPONDED
+from .approver_directory import ApproverDirectory
+from .graph_auth import GraphTokenProvider
+from .graph_batch import GraphBatch
+from .graph_collections import iter_items
+from .http_client import DEFAULT_POOL_SIZE, get_client
+from .logs import log_payload, ticket_fields
+from .metrics import METRICS
+from .reconcile import APPROVAL_FIELDS, apply_approval_state, sync_approval_states
+from .ticket_pipeline import new_result
+from .throttling import AdaptiveThrottle
+
+APPROVALS_PATH = "/beta/solutions/approval/approvalItems"
+
+logger = logging.getLogger(__name__)
+
+def escape_odata_string(value):
+
+    return value.replace("'", "''")
+
+def approval_id_from_location(resource_location):
+
+    match = re.search(r"approvalItems(?:/|\(')(?!operations)([^/'()?]+)", resource_location or "")
+    return match.group(1) if match else None
+
+def approval_id_from_create(body, headers):
+
+    if isinstance(body, dict) and body.get("id"):
+        return body["id"], None
+
+    operation_url = headers.get("Location") or headers.get("Operation-Location")
+    if operation_url:
+        return approval_id_from_location(operation_url), operation_url
+    return None, None
+
+def batch_error_message(result):
+
+    body = result["body"] if isinstance(result["body"], dict) else {}
+    return f"{result['status']} - {body.get('error', {}).get('message', result['body'])}"
+
+class ApprovalClient:
+
+    def __init__(self, graph, source=None, store=None, directory=None):
+
+        self.graph = graph
+        self.source = source
+        self.store = store
+        self.directory = directory or ApproverDirectory(graph, ttl=config.APPROVER_CACHE_TTL, cache_path=config.APPROVER_CACHE_PATH)
+
+    @classmethod
+    def connect(cls, source=None, store=None, pool_size=DEFAULT_POOL_SIZE):
+
+        graph = get_client(config.GRAPH_API_BASE, pool_size=pool_size, throttle=AdaptiveThrottle(max_concurrency=pool_size))
+        token_provider = GraphTokenProvider(config.CLIENT_ID, config.AUTHORITY, config.SCOPE, cache_path=config.TOKEN_CACHE_PATH)
+        with METRICS.phase("auth"):
+            token_provider.token()
+        graph.set_token_provider(token_provider)
+        graph.correlation_header = "client-request-id"
+        logger.info("Authenticated successfully with Microsoft Graph.")
+        return cls(graph, source, store)
+
+    @property
+    def noun(self):
+
+        return self.source.noun if self.source else "ticket"
+
+    def list_approvals(self, display_name, post_time, retries=2, delay=5, top=25, max_pages=5):
+
+        params = {
+            "$filter": f"displayName eq '{escape_odata_string(display_name)}'",
+            "$orderby": "createdDateTime desc",
+            "$select": "id,displayName,createdDateTime",
+            "$top": str(top)
+        }
+        earliest = post_time - timedelta(seconds=self.source.match_window)
+
+        METRICS.inc("approval_lookups_total")
+        for attempt in range(retries + 1):
+            scanned = 0
+            try:
+                for approval in iter_items(self.graph, APPROVALS_PATH, params, max_pages):
+                    scanned += 1
+                    METRICS.inc("approval_lookup_items_scanned_total")
+                    created_time = parse(approval["createdDateTime"]).astimezone(timezone.utc)
+                    if created_time < earliest:
+                        # Newest first: everything after this is older than the window.
+                        break
+                    if approval["displayName"].lower() == display_name.lower():
+                        logger.info("Matched approval ID: %s at %s after scanning %d approvals", approval["id"], created_time, scanned)
+                        return approval["id"]
+            except requests.exceptions.RequestException as e:
+                logger.warning("Attempt %d: List approvals request failed: %s", attempt + 1, e)
+                return None
+            except Exception as e:
+                logger.warning("Attempt %d: %s", attempt + 1, e)
+                return None
+
+            if attempt < retries:
+                logger.info("No approval found for %s at attempt %d (%d scanned). Retrying in %s seconds...", display_name, attempt + 1, scanned, delay)
+                METRICS.sleep(delay, "list_retry")
+
+        logger.warning("No approval found with displayName: %s created around %s after %d attempts", display_name, post_time, retries + 1)
+        return None
+
+    def wait_for_approval_operation(self, operation_url, retries=10, delay=1):
+
+        for attempt in range(retries + 1):
+            try:
+                response = self.graph.get(operation_url)
+            except requests.exceptions.RequestException as e:
+                logger.warning("Approval operation poll failed: %s", e)
+                return None
+
+            if response.status_code != 200:
+                logger.warning("Failed to read approval operation: %s - %s", response.status_code, response.text)
+                return None
+
+            operation = response.json()
+            status = operation.get("status")
+            if status == "succeeded":
+                return approval_id_from_location(operation.get("resourceLocation"))
+            if status == "failed":
+                logger.warning("Approval operation failed: %s", operation.get("error"))
+                return None
+
+            if attempt < retries:
+                METRICS.sleep(delay, "operation_poll")
+
+        logger.warning("Approval operation %s did not complete after %d polls", operation_url, retries + 1)
+        return None
+
+    def resolve_approval_id(self, body, headers, display_name, post_time):
+
+        approval_id, operation_url = approval_id_from_create(body, headers)
+        if approval_id:
+            return approval_id
+
+        if operation_url:
+            approval_id = self.wait_for_approval_operation(operation_url)
+            if approval_id:
+                return approval_id
+
+        logger.info("Falling back to listing approvals for %s", display_name)
+        if self.source.list_fallback_delay:
+            METRICS.sleep(self.source.list_fallback_delay, "list_fallback")
+        return self.list_approvals(display_name, post_time)
+
+    def submit_response(self, approval_id, response="Approve", comments="Auto-processed"):
+
+        payload = {
+            "response": response,
+            "comments": comments
+        }
+
+        try:
+            with METRICS.phase("respond"):
+                response = self.graph.post(f"{APPROVALS_PATH}/{approval_id}/responses", json=payload)
+            if response.status_code in [200, 201, 202]:
+                logger.info("Successfully set approval %s status to %s (HTTP %d)", approval_id, payload["response"], response.status_code)
+                if response.content:
+                    log_payload(logger, "Response body", response.text)
+                return True
+            else:
+                logger.error("Failed to set approval %s status: %s - %s", approval_id, response.status_code, response.text)
+        except requests.exceptions.RequestException as e:
+            logger.error("Response submission failed for approval %s: %s", approval_id, e)
+        return False
+
+    def build_approval_payload(self, approver_id, approver_display_name, ticket):
+
+        return {
+            "displayName": ticket["title"],
+            "description": f"{ticket['description']} ({self.source.id_label}: {ticket['id']}, Status: {ticket['status']})",
+            "approvalType": "basic",
+            "allowEmailNotification": True,
+            "approvers": [
+                {
+                    "user": {
+                        "id": approver_id,
+                        "displayName": approver_display_name
+                    }
+                }
+            ]
+        }
+
+    def response_comments(self, ticket, desired_status):
+
+        return f"Auto-{desired_status.lower()} for {self.noun} #{ticket['id']}"
+
+    def post_approval(self, payload):
+
+        try:
+            with METRICS.phase("create"):
+                return self.graph.post(APPROVALS_PATH, json=payload)
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Approval request failed: {str(e)}")
+
+    def respond_to_approval(self, ticket, approval_id, desired_status):
+
+        responded = self.submit_response(approval_id, response=desired_status, comments=self.response_comments(ticket, desired_status))
+        if responded:
+            self.store.mark_responded(self.source.name, ticket["id"], desired_status)
+        return {"approval_id": approval_id, "responded": responded}
+
+    def resume_approval(self, record, ticket, desired_status):
+
+        approval_id = record["approval_id"]
+        if approval_id:
+            logger.info("Resuming %s ID %s: responding to existing approval %s", self.noun, ticket["id"], approval_id)
+        else:
+            logger.info("Resuming %s ID %s: looking up approval created at %s", self.noun, ticket["id"], record["created_at"])
+            approval_id = self.list_approvals(ticket["title"], parse(record["created_at"]))
+            if not approval_id:
+                logger.warning("Could not find approval ID; manual action required in Teams.")
+                return {"approval_id": None, "responded": False}
+            self.store.mark_resolved(self.source.name, ticket["id"], approval_id)
+        return self.respond_to_approval(ticket, approval_id, desired_status)
+
+    def create_approval(self, approver_id, approver_display_name, ticket, desired_status="Approve"):
+
+        payload = self.build_approval_payload(approver_id, approver_display_name, ticket)
+
+        try:
+            post_time = datetime.now(timezone.utc)
+            with METRICS.phase("create"):
+                response = self.graph.post(APPROVALS_PATH, json=payload)
+
+            if response.status_code in [201, 202]:
+                logger.info("Approval created successfully for %s ID %s: %s (Status: Requested)", self.noun, ticket["id"], ticket["title"])
+                self.store.mark_created(self.source.name, ticket["id"], desired_status, post_time)
+                body = None
+                if response.content:
+                    try:
+                        body = response.json()
+                    except ValueError:
+                        pass
+                    log_payload(logger, "Create response body", response.text)
+
+                with METRICS.phase("resolve"):
+                    approval_id = self.resolve_approval_id(body, response.headers, ticket["title"], post_time)
+                if approval_id:
+                    logger.info("Found approval ID: %s", approval_id)
+                    self.store.mark_resolved(self.source.name, ticket["id"], approval_id)
+                    return self.respond_to_approval(ticket, approval_id, desired_status)
+                logger.warning("Could not find approval ID; manual action required in Teams.")
+                return {"approval_id": None, "responded": False}
+            else:
+                raise Exception(f"Failed to create approval for {self.noun} ID {ticket['id']}: {response.status_code} - {response.text}")
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Approval request failed for {self.noun} ID {ticket['id']}: {str(e)}")
+
+    def wait_for_approval_operations(self, operation_urls, retries=10, delay=1):
+
+        pending = dict(operation_urls)
+        resolved = {}
+
+        for attempt in range(retries + 1):
+            batch = GraphBatch(self.graph)
+            request_ids = {key: batch.add("GET", url) for key, url in pending.items()}
+            results = batch.execute()
+
+            for key, request_id in request_ids.items():
+                result = results[request_id]
+                operation = result["body"] if isinstance(result["body"], dict) else {}
+                if result["status"] != 200 or operation.get("status") == "failed":
+                    logger.warning("Approval operation %s did not succeed: %s", pending[key], batch_error_message(result))
+                    del pending[key]
+                elif operation.get("status") == "succeeded":
+                    resolved[key] = approval_id_from_location(operation.get("resourceLocation"))
+                    del pending[key]
+
+            if not pending:
+                break
+            if attempt < retries:
+                METRICS.sleep(delay, "operation_poll")
+
+        return resolved
+
+    def process_tickets_batched(self, records, approvers, work):
+
+        source = self.source.name
+        started = time.monotonic()
+        results = {ticket["id"]: new_result(ticket, desired_status) for ticket, desired_status in work}
+        tickets = {ticket["id"]: (ticket, desired_status) for ticket, desired_status in work}
+
+        post_time = datetime.now(timezone.utc)
+        lookup_times = {}
+        batch = GraphBatch(self.graph)
+        create_ids = {}
+        for ticket_id, (ticket, desired_status) in tickets.items():
+            record = records.get(str(ticket_id))
+            if record:
+                results[ticket_id]["approval_id"] = record["approval_id"]
+                lookup_times[ticket_id] = parse(record["created_at"])
+            else:
+                create_ids[ticket_id] = batch.add("POST", "/solutions/approval/approvalItems", self.build_approval_payload(*approvers[ticket_id], ticket))
+                lookup_times[ticket_id] = post_time
+        with METRICS.phase("create"):
+            created = batch.execute()
+
+        operations = {}
+        for ticket_id, request_id in create_ids.items():
+            result = created[request_id]
+            if result["status"] not in [201, 202]:
+                results[ticket_id]["error"] = f"Failed to create approval: {batch_error_message(result)}"
+                continue
+            logger.info("Approval created successfully for %s ID %s: %s (Status: Requested)", self.noun, ticket_id, tickets[ticket_id][0]["title"], extra=ticket_fields(source, ticket_id))
+            approval_id, operation_url = approval_id_from_create(result["body"], result["headers"])
+            self.store.mark_created(source, ticket_id, tickets[ticket_id][1], post_time, approval_id)
+            if approval_id:
+                results[ticket_id]["approval_id"] = approval_id
+            elif operation_url:
+                operations[ticket_id] = operation_url
+
+        with METRICS.phase("resolve"):
+            resolved = self.wait_for_approval_operations(operations)
+        for ticket_id, approval_id in resolved.items():
+            results[ticket_id]["approval_id"] = approval_id
+            if approval_id:
+                self.store.mark_resolved(source, ticket_id, approval_id)
+
+        for ticket_id, result in results.items():
+            if not result["approval_id"] and not result["error"]:
+                with METRICS.phase("resolve"):
+                    result["approval_id"] = self.list_approvals(tickets[ticket_id][0]["title"], lookup_times[ticket_id])
+                if result["approval_id"]:
+                    self.store.mark_resolved(source, ticket_id, result["approval_id"])
+
+        batch = GraphBatch(self.graph)
+        response_ids = {}
+        for ticket_id, result in results.items():
+            if result["approval_id"]:
+                ticket, desired_status = tickets[ticket_id]
+                payload = {
+                    "response": desired_status,
+                    "comments": self.response_comments(ticket, desired_status)
+                }
+                response_ids[ticket_id] = batch.add("POST", f"/solutions/approval/approvalItems/{result['approval_id']}/responses", payload)
+        with METRICS.phase("respond"):
+            responded = batch.execute()
+
+        for ticket_id, request_id in response_ids.items():
+            result = responded[request_id]
+            if result["status"] in [200, 201, 202]:
+                results[ticket_id]["responded"] = True
+                self.store.mark_responded(source, ticket_id, tickets[ticket_id][1])
+                logger.info("Successfully set approval %s status to %s", results[ticket_id]["approval_id"], tickets[ticket_id][1], extra=ticket_fields(source, ticket_id))
+            else:
+                logger.error("Failed to set approval %s status: %s", results[ticket_id]["approval_id"], batch_error_message(result), extra=ticket_fields(source, ticket_id))
+
+        duration = time.monotonic() - started
+        for result in results.values():
+            result["duration"] = duration
+        return list(results.values())
+
+    def iter_approvals(self, params=None, max_pages=None):
+
+        return iter_items(self.graph, APPROVALS_PATH, {"$select": APPROVAL_FIELDS, **(params or {})}, max_pages)
+
+    def iter_recent_approvals(self, earliest, max_pages=5):
+
+        # Newest first, stopping at the first approval older than `earliest`.
+        for approval in self.iter_approvals({"$orderby": "createdDateTime desc"}, max_pages):
+            if parse(approval["createdDateTime"]).astimezone(timezone.utc) < earliest:
+                return
+            yield approval
+
+    def refresh_approvals(self, approval_ids):
+
+        batch = GraphBatch(self.graph)
+        request_ids = {approval_id: batch.add("GET", f"/solutions/approval/approvalItems/{approval_id}?$select={APPROVAL_FIELDS}") for approval_id in approval_ids if approval_id}
+        results = batch.execute()
+
+        updated = []
+        for approval_id, request_id in request_ids.items():
+            result = results[request_id]
+            if result["status"] != 200:
+                logger.warning("Failed to read approval %s: %s", approval_id, batch_error_message(result))
+                continue
+            ticket_id = apply_approval_state(self.store, self.source.name, self.source.id_label, result["body"])
+            if ticket_id is not None:
+                logger.info("Approval %s for %s ID %s is now %s", approval_id, self.noun, ticket_id, result["body"].get("state"), extra=ticket_fields(self.source.name, ticket_id))
+                updated.append(ticket_id)
+        return updated
+
+    def apply_approval_changes(self, notifications):
+
+        self.refresh_approvals({(n.get("resourceData") or {}).get("id") or approval_id_from_location(n.get("resource")) for n in notifications})
+
+    def poll_approval_states(self, max_pages=5):
+
+        # Approvals we know the ID of are read by ID; only records still
+        # waiting for an ID are matched against a bounded window of recent
+        # approvals, so a stuck record never costs a walk of the whole tenant.
+        pending = {ticket_id: record for ticket_id, record in self.store.load(self.source.name).items() if record["state"] != RESPONDED}
+        unknown = {ticket_id for ticket_id, record in pending.items() if not record["approval_id"]}
+        with METRICS.phase("approval_state_poll"):
+            updated = self.refresh_approvals({record["approval_id"] for record in pending.values() if record["approval_id"]})
+            if unknown:
+                earliest = min(parse(pending[ticket_id]["created_at"]) for ticket_id in unknown) - timedelta(seconds=self.source.match_window)
+                approvals = self.iter_recent_approvals(earliest.astimezone(timezone.utc), max_pages)
+                updated += sync_approval_states(self.store, self.source.name, self.source.id_label, approvals, unknown)
+        if updated:
+            logger.info("Updated %d approval records from Teams without change notifications", len(updated))
@@ -0,0 +1,96 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def flag(value):
+
+    return value.lower() in ('1', 'true', 'yes')
+
+def env_flag(name):
+
+    return flag(os.getenv(name, ''))
+
+CLIENT_ID = os.getenv('CLIENT_ID')
+TENANT_ID = os.getenv('TENANT_ID')
+APPROVER_EMAIL = os.getenv('APPROVER_EMAIL')
+APPROVER_ROUTES_PATH = os.getenv('APPROVER_ROUTES_PATH')
+APPROVER_CACHE_PATH = os.getenv('APPROVER_CACHE_PATH', '.approvers.json')
+APPROVER_CACHE_TTL = float(os.getenv('APPROVER_CACHE_TTL', '3600'))
+TOKEN_CACHE_PATH = os.getenv('TOKEN_CACHE_PATH', '.token_cache.json')
+APPROVAL_STORE_PATH = os.getenv('APPROVAL_STORE_PATH', '.approvals.db')
+INCREMENTAL_SYNC = env_flag('INCREMENTAL_SYNC')
+POLL_INTERVAL = float(os.getenv('POLL_INTERVAL', '300'))
+POLL_JITTER = float(os.getenv('POLL_JITTER', '0.1'))
+METRICS_PATH = os.getenv('METRICS_PATH')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+MAX_CONCURRENT_TICKETS = int(os.getenv('MAX_CONCURRENT_TICKETS', '1'))
+USE_GRAPH_BATCH = env_flag('USE_GRAPH_BATCH')
+DECISION_RULES_PATH = os.getenv('DECISION_RULES_PATH')
+QUEUE_LEASE_SECONDS = float(os.getenv('QUEUE_LEASE_SECONDS', '60'))
+QUEUE_MAX_ATTEMPTS = int(os.getenv('QUEUE_MAX_ATTEMPTS', '5'))
+QUEUE_RETRY_DELAY = float(os.getenv('QUEUE_RETRY_DELAY', '30'))
+QUEUE_CLAIM_SIZE = int(os.getenv('QUEUE_CLAIM_SIZE', '50'))
+SCHEDULE_PATH = os.getenv('SCHEDULE_PATH')
+SCHEDULE_DEADLINE_HORIZON = float(os.getenv('SCHEDULE_DEADLINE_HORIZON', '300'))
+NOTIFICATION_URL = os.getenv('NOTIFICATION_URL')
+NOTIFICATION_HOST = os.getenv('NOTIFICATION_HOST', '127.0.0.1')
+NOTIFICATION_PORT = int(os.getenv('NOTIFICATION_PORT', '8080'))
+SUBSCRIPTION_LIFETIME = float(os.getenv('SUBSCRIPTION_LIFETIME', '3600'))
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_PATH = os.getenv('LOG_PATH')
+LOG_PAYLOAD_LIMIT = int(os.getenv('LOG_PAYLOAD_LIMIT', '2048'))
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', '0'))
+SHARD_STATE_DIR = os.getenv('SHARD_STATE_DIR', '.shards')
+
+TICKETS_API_URL = os.getenv('TICKETS_API_URL', 'https://ticket-teams.fly.dev/tickets')
+API_BASE_URL = os.getenv('API_BASE_URL', 'https://wo-flow-prod-10-2023-os3mt.ondigitalocean.app')
+API_USERNAME = os.getenv('API_USERNAME')
+API_PASSWORD = os.getenv('API_PASSWORD')
+SOURCE_TOKEN_CACHE_PATH = os.getenv('SOURCE_TOKEN_CACHE_PATH')
+
+AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
+SCOPE = ["https://graph.microsoft.com/ApprovalSolution.ReadWrite", "https://graph.microsoft.com/User.Read"]
+GRAPH_API_BASE = os.getenv('GRAPH_API_BASE', 'https://graph.microsoft.com')
+
+def apply(settings):
+
+    # Points this process at another tenant or source (see shards.py). Returns
+    # the previous values so the caller can put them back with apply() again.
+    current = globals()
+    previous = {}
+    for name, value in settings.items():
+        if not name.isupper() or name not in current:
+            raise Exception(f"Unknown setting: {name}")
+        previous[name] = current[name]
+        current[name] = value
+    if "TENANT_ID" in settings and "AUTHORITY" not in settings:
+        previous["AUTHORITY"] = current["AUTHORITY"]
+        current["AUTHORITY"] = f"https://login.microsoftonline.com/{current['TENANT_ID']}"
+    return previous
+
+def parse_setting(name, value):
+
+    # Overrides (shard files) may hold JSON values or the strings an env file
+    # would; either way the result has the type the setting already has.
+    current = globals()[name]
+    if value is None or current is None:
+        return value
+    if isinstance(current, bool):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str):
+            return flag(value)
+    elif isinstance(current, (int, float)):
+        if isinstance(value, str):
+            try:
+                return type(current)(value)
+            except ValueError:
+                pass
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and (isinstance(current, float) or value == int(value)):
+            return type(current)(value)
+    elif isinstance(value, type(current)):
+        return value
+    raise Exception(f"Setting {name} expects {type(current).__name__}, got {value!r}")
@@ -0,0 +1,36 @@
+import logging
+import random
+import signal
+import threading
+
+logger = logging.getLogger(__name__)
+
+def install_shutdown_handlers(stop_event):
+
+    def handle_signal(signum, frame):
+        # Not logged: the handler may interrupt a thread that holds the log queue's lock.
+        print(f"Received signal {signum}; finishing in-flight tickets before shutting down...")
+        stop_event.set()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, handle_signal)
+
+def next_poll_delay(interval, jitter):
+
+    return max(0.0, interval * (1 + random.uniform(-jitter, jitter)))
+
+def run_daemon(poll, interval, jitter=0.1, stop_event=None):
+
+    stop_event = stop_event or threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        install_shutdown_handlers(stop_event)
+
+    logger.info("Polling every %ss (jitter %.0f%%). Press Ctrl+C to stop.", interval, jitter * 100)
+    while not stop_event.is_set():
+        try:
+            poll(stop_event)
+        except Exception as e:
+            logger.error("Poll failed: %s", e)
+        stop_event.wait(next_poll_delay(interval, jitter))
+
+    logger.info("Daemon stopped.")
@@ -0,0 +1,58 @@
+import hashlib
+import json
+
+def ticket_digest(ticket):
+
+    return hashlib.sha1(json.dumps(dict(ticket), sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class DeltaSync:
+
+    def __init__(self, store, source, key="id"):
+
+        self.store = store
+        self.source = source
+        self.key = key
+        self.watermark = store.get_watermark(source)
+        self.snapshots = store.load_snapshots(source)
+        self.digests = {}
+
+    def is_new(self, ticket):
+
+        if self.watermark is None:
+            return True
+        try:
+            return int(ticket[self.key]) > int(self.watermark)
+        except (TypeError, ValueError):
+            return str(ticket[self.key]) > self.watermark
+
+    def changed(self, tickets):
+
+        # The ticket APIs have no server-side change filter, so the full list
+        # is diffed against the digests stored after the previous run.
+        changed = []
+        for ticket in tickets:
+            ticket_id = str(ticket[self.key])
+            digest = ticket_digest(ticket)
+            self.digests[ticket_id] = digest
+            if self.is_new(ticket) or self.snapshots.get(ticket_id) != digest:
+                changed.append(ticket)
+        return changed
+
+    def commit(self, failed_ids=()):
+
+        failed = {str(ticket_id) for ticket_id in failed_ids}
+        digests = {ticket_id: digest for ticket_id, digest in self.digests.items() if ticket_id not in failed}
+        if digests:
+            self.store.save_snapshots(self.source, digests)
+
+        ids = list(self.digests)
+        if ids:
+            try:
+                watermark = max(ids, key=int)
+            except ValueError:
+                watermark = max(ids)
+            if self.watermark is None or self.is_new({self.key: watermark}):
+                self.store.set_watermark(self.source, watermark)
+                self.watermark = str(watermark)
+        self.snapshots.update(digests)
+        self.digests = {}
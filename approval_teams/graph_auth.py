@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import msal
+
+from .metrics import METRICS
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+REFRESH_MARGIN_SECONDS = 300
+
+@contextmanager
+def file_lock(path):
+
+    with open(f"{path}.lock", "a+") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+class FileTokenCache(msal.SerializableTokenCache):
+
+    def __init__(self, path):
+
+        super().__init__()
+        self.path = path
+
+    def reload(self):
+
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self.deserialize(f.read())
+
+    def persist(self):
+
+        if not self.has_state_changed:
+            return
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(self.serialize())
+        os.replace(tmp_path, self.path)
+        self.has_state_changed = False
+
+    @contextmanager
+    def locked(self):
+
+        # Other processes may have refreshed the cache since we last read it,
+        # so always work on the latest copy and write back before unlocking.
+        with file_lock(self.path):
+            self.reload()
+            try:
+                yield self
+            finally:
+                self.persist()
+
+class GraphTokenProvider:
+
+    def __init__(self, client_id, authority, scopes, cache_path=None, refresh_margin=REFRESH_MARGIN_SECONDS, interactive=True):
+
+        self.scopes = scopes
+        self.refresh_margin = refresh_margin
+        self.interactive = interactive
+        self.cache = FileTokenCache(cache_path) if cache_path else None
+        self.app = msal.PublicClientApplication(
+            client_id=client_id,
+            authority=authority,
+            token_cache=self.cache
+        )
+        self.access_token = None
+        self.expires_at = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+
+        return self.token()
+
+    def token(self):
+
+        with self.lock:
+            if not self.access_token or time.time() >= self.expires_at - self.refresh_margin:
+                with METRICS.phase("token_acquire"):
+                    self.acquire(force_refresh=self.access_token is not None)
+            return self.access_token
+
+    def acquire(self, force_refresh=False):
+
+        if self.cache:
+            with self.cache.locked():
+                result = self.acquire_silent(force_refresh)
+                if not result:
+                    result = self.acquire_by_device_flow()
+        else:
+            result = self.acquire_silent(force_refresh) or self.acquire_by_device_flow()
+
+        self.access_token = result["access_token"]
+        self.expires_at = time.time() + int(result.get("expires_in", 3600))
+
+    def acquire_silent(self, force_refresh=False):
+
+        accounts = self.app.get_accounts()
+        if not accounts:
+            return None
+        result = self.app.acquire_token_silent(scopes=self.scopes, account=accounts[0], force_refresh=force_refresh)
+        if result and "access_token" in result:
+            return result
+        return None
+
+    def acquire_by_device_flow(self):
+
+        if not self.interactive:
+            raise Exception("No cached Microsoft Graph login available and interactive sign-in is disabled")
+
+        flow = self.app.initiate_device_flow(scopes=self.scopes)
+        if "user_code" not in flow:
+            raise Exception("Failed to create device flow")
+
+        print(f"Please go to {flow['verification_uri']} and enter code: {flow['user_code']}")
+        import webbrowser
+        webbrowser.open(flow["verification_uri"])
+
+        result = self.app.acquire_token_by_device_flow(flow)
+        if "access_token" in result:
+            return result
+        else:
+            raise Exception(f"Authentication failed: {result.get('error_description', 'Unknown error')}")
@@ -0,0 +1,148 @@
+import logging
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from . import config
+from .http_client import get_client
+from .metrics import METRICS
+from .throttling import THROTTLED_STATUS_CODES, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+GRAPH_BATCH_LIMIT = 20
+
+def relative_graph_url(url, version="beta"):
+
+    parts = urlsplit(url)
+    url = f"{parts.path}?{parts.query}" if parts.query else parts.path
+    if url.startswith(f"/{version}/"):
+        url = url[len(version) + 1:]
+    return url if url.startswith("/") else f"/{url}"
+
+class GraphBatch:
+
+    def __init__(self, graph=None, version="beta", limit=GRAPH_BATCH_LIMIT):
+
+        self.graph = graph or get_client(config.GRAPH_API_BASE)
+        self.version = version
+        self.limit = limit
+        self.requests = []
+
+    def add(self, method, url, body=None, depends_on=None):
+
+        request_id = str(len(self.requests) + 1)
+        sub_request = {
+            "id": request_id,
+            "method": method,
+            "url": relative_graph_url(url, self.version)
+        }
+        if body is not None:
+            sub_request["body"] = body
+            sub_request["headers"] = {"Content-Type": "application/json"}
+        if depends_on:
+            sub_request["dependsOn"] = list(depends_on)
+        self.requests.append(sub_request)
+        return request_id
+
+    def envelopes(self):
+
+        # Requests chained with dependsOn have to travel in the same envelope,
+        # so pack whole dependency groups rather than individual requests.
+        groups = []
+        group_of = {}
+        for sub_request in self.requests:
+            parents = [group_of[d] for d in sub_request.get("dependsOn", []) if d in group_of]
+            if parents:
+                group = parents[0]
+                for other in parents[1:]:
+                    if other is not group:
+                        group.extend(other)
+                        for member in other:
+                            group_of[member["id"]] = group
+                        groups.remove(other)
+            else:
+                group = []
+                groups.append(group)
+            group.append(sub_request)
+            group_of[sub_request["id"]] = group
+
+        envelope = []
+        for group in groups:
+            if len(group) > self.limit:
+                raise Exception(f"Dependency chain of {len(group)} requests exceeds the $batch limit of {self.limit}")
+            if len(envelope) + len(group) > self.limit:
+                yield envelope
+                envelope = []
+            envelope.extend(sorted(group, key=lambda r: int(r["id"])))
+        if envelope:
+            yield envelope
+
+    def send_envelope(self, envelope):
+
+        try:
+            response = self.graph.post(f"/{self.version}/$batch", json={"requests": envelope}, timeout=30)
+        except requests.exceptions.RequestException as e:
+            return {sub_request["id"]: batch_error(0, f"Batch request failed: {str(e)}") for sub_request in envelope}
+
+        if response.status_code != 200:
+            return {sub_request["id"]: batch_error(response.status_code, response.text) for sub_request in envelope}
+
+        results = {}
+        for sub_response in response.json().get("responses", []):
+            results[sub_response["id"]] = {
+                "status": sub_response.get("status", 0),
+                "headers": CaseInsensitiveDict(sub_response.get("headers") or {}),
+                "body": sub_response.get("body")
+            }
+        for sub_request in envelope:
+            results.setdefault(sub_request["id"], batch_error(0, "No response returned in $batch envelope"))
+        return results
+
+    def throttled_requests(self, envelope, results):
+
+        throttled = {r["id"] for r in envelope if results[r["id"]]["status"] in THROTTLED_STATUS_CODES}
+        for sub_request in envelope:
+            if results[sub_request["id"]]["status"] == 424 and throttled.intersection(sub_request.get("dependsOn", [])):
+                throttled.add(sub_request["id"])
+
+        retry = []
+        for sub_request in envelope:
+            if sub_request["id"] in throttled:
+                sub_request = dict(sub_request)
+                depends_on = [d for d in sub_request.pop("dependsOn", []) if d in throttled]
+                if depends_on:
+                    sub_request["dependsOn"] = depends_on
+                retry.append(sub_request)
+        return retry
+
+    def execute(self):
+
+        throttle = getattr(self.graph, "throttle", None)
+        max_retries = throttle.max_retries if throttle else 0
+        results = {}
+        for envelope in self.envelopes():
+            pending = envelope
+            for attempt in range(max_retries + 1):
+                sent = self.send_envelope(pending)
+                results.update(sent)
+                pending = self.throttled_requests(pending, sent)
+                if not pending or attempt == max_retries:
+                    break
+                retry_after = max((parse_retry_after(sent[r["id"]]["headers"].get("Retry-After")) or 0.0) for r in pending)
+                delay = throttle.backoff_delay(attempt, retry_after or None)
+                throttle.on_throttled(delay)
+                METRICS.inc("http_retries_total", len(pending), status="batch")
+                logger.info("%d $batch sub-requests throttled; retrying in %.1fs", len(pending), delay)
+
+        self.requests = []
+        return results
+
+def batch_error(status, message):
+
+    return {
+        "status": status,
+        "headers": CaseInsensitiveDict(),
+        "body": {"error": {"message": message}}
+    }
@@ -0,0 +1,22 @@
+from .metrics import METRICS, route_template
+
+def iter_pages(graph, path, params=None, max_pages=None):
+
+    url = path
+    pages = 0
+    while url and (max_pages is None or pages < max_pages):
+        response = graph.get(url, params=params)
+        if response.status_code != 200:
+            raise Exception(f"Failed to list {path}: {response.status_code} - {response.text}")
+        data = response.json()
+        pages += 1
+        METRICS.inc("graph_pages_fetched_total", collection=route_template(path))
+        yield data.get("value", [])
+        # nextLink already carries the original query options.
+        url = data.get("@odata.nextLink")
+        params = None
+
+def iter_items(graph, path, params=None, max_pages=None):
+
+    for page in iter_pages(graph, path, params, max_pages):
+        yield from page
@@ -0,0 +1,122 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .logs import correlation_id
+from .metrics import METRICS
+
+DEFAULT_POOL_SIZE = 10
+
+class HttpClient:
+
+    def __init__(self, base_url, pool_size=DEFAULT_POOL_SIZE, headers=None, timeout=10, throttle=None):
+
+        parts = urlsplit(base_url)
+        self.base_url = f"{parts.scheme}://{parts.netloc}"
+        self.timeout = timeout
+        self.token_provider = None
+        self.throttle = throttle
+        # Header that carries the current ticket's correlation ID, if the API has one.
+        self.correlation_header = None
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        self.session.headers.update(headers or {})
+        self.resize(pool_size)
+
+    def resize(self, pool_size):
+
+        self.pool_size = pool_size
+        prefix = f"{self.base_url}/"
+        replaced = self.session.adapters.get(prefix)
+        self.session.mount(prefix, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        if replaced:
+            # Idle connections close now; ones still in use close when returned.
+            replaced.close()
+
+    def set_bearer_token(self, token):
+
+        self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def set_token_provider(self, token_provider):
+
+        self.token_provider = token_provider
+
+    def url(self, path):
+
+        return path if path.startswith(("http://", "https://")) else f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, **kwargs):
+
+        kwargs.setdefault("timeout", self.timeout)
+        # Clients are shared per host, so an API on the same host as Graph
+        # passes its own Authorization header and must keep it.
+        headers = kwargs.get("headers") or {}
+        if self.token_provider and not any(name.lower() == "authorization" for name in headers):
+            kwargs["headers"] = {**headers, "Authorization": f"Bearer {self.token_provider()}"}
+        if self.correlation_header and correlation_id():
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), self.correlation_header: correlation_id()}
+        url = self.url(path)
+
+        def send():
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException:
+                METRICS.record_http(method, url, "error", time.monotonic() - started, 0, 0)
+                raise
+            # A streamed body is read later by the caller, so count what the server announced.
+            received = int(response.headers.get("Content-Length") or 0) if kwargs.get("stream") else len(response.content)
+            METRICS.record_http(method, url, response.status_code, time.monotonic() - started, len(response.request.body or b""), received)
+            return response
+
+        if self.throttle:
+            return self.throttle.send(send)
+        return send()
+
+    def get(self, path, **kwargs):
+
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+
+        return self.request("POST", path, **kwargs)
+
+    def patch(self, path, **kwargs):
+
+        return self.request("PATCH", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+
+        self.session.close()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(base_url, pool_size=DEFAULT_POOL_SIZE, throttle=None, **kwargs):
+
+    # One client per host. A later caller can grow the pool or add a throttle
+    # to a client that has none, but not change its headers or timeout.
+    parts = urlsplit(base_url)
+    key = (parts.scheme, parts.netloc)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = HttpClient(base_url, pool_size=pool_size, throttle=throttle, **kwargs)
+            return client
+        conflicts = [name for name, value in (kwargs.get("headers") or {}).items() if client.session.headers.get(name) != value]
+        if "timeout" in kwargs and kwargs["timeout"] != client.timeout:
+            conflicts.append("timeout")
+        if conflicts:
+            raise Exception(f"HTTP client for {client.base_url} already exists with different {', '.join(conflicts)}")
+        if pool_size > client.pool_size:
+            client.resize(pool_size)
+        if throttle and not client.throttle:
+            client.throttle = throttle
+        return client
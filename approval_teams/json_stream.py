@@ -0,0 +1,89 @@
+import codecs
+import json
+
+DECODER = json.JSONDecoder()
+WHITESPACE = " \t\n\r"
+
+class JSONStream:
+
+    # Decodes one JSON value at a time from a sequence of byte chunks, keeping
+    # only the not-yet-parsed tail of the body in memory.
+
+    def __init__(self, chunks):
+
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.done = False
+
+    def fill(self):
+
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.done = True
+            text = self.decoder.decode(b"", final=True)
+        else:
+            text = self.decoder.decode(chunk)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+
+    def peek(self):
+
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.done:
+                return self.buffer[self.pos:self.pos + 1]
+            self.fill()
+
+    def accept(self, char):
+
+        if self.peek() != char:
+            return False
+        self.pos += 1
+        return True
+
+    def expect(self, char):
+
+        if not self.accept(char):
+            raise Exception(f"Malformed JSON: expected '{char}' but found '{self.peek() or 'end of body'}'")
+
+    def value(self):
+
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.buffer, self.pos)
+                # A number at the very end of the buffer may continue in the next chunk.
+                if end < len(self.buffer) or self.done:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.done:
+                    raise
+            self.fill()
+
+def iter_array_member(chunks, key, members):
+
+    # Yields the items of the array stored under `key` in a top-level JSON
+    # object; every other top-level member is decoded whole into `members`.
+    stream = JSONStream(chunks)
+    stream.expect("{")
+    if stream.accept("}"):
+        return
+    while True:
+        name = stream.value()
+        stream.expect(":")
+        if name == key and stream.accept("["):
+            if not stream.accept("]"):
+                while True:
+                    yield stream.value()
+                    if not stream.accept(","):
+                        break
+                stream.expect("]")
+        else:
+            members[name] = stream.value()
+        if not stream.accept(","):
+            break
+    stream.expect("}")
@@ -0,0 +1,140 @@
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+from . import config
+
+# Who a log line is about. Set around each ticket (and each shard in the
+# sharded runner) and copied onto every record made in that context, including
+# records from the worker threads that ticket runs on.
+LOG_CONTEXT = contextvars.ContextVar("log_context", default={})
+
+CONTEXT_FIELDS = ("shard", "ticket", "correlation_id")
+
+_listener = None
+_queue = None
+
+@contextmanager
+def log_context(**fields):
+
+    token = LOG_CONTEXT.set({**LOG_CONTEXT.get(), **fields})
+    try:
+        yield
+    finally:
+        LOG_CONTEXT.reset(token)
+
+@contextmanager
+def ticket_context(source, ticket_id):
+
+    # The correlation ID is also sent to Graph as client-request-id, so a
+    # ticket's log lines can be matched with Graph's own request logs.
+    with log_context(ticket=f"{source}:{ticket_id}", correlation_id=str(uuid.uuid4())):
+        yield
+
+def ticket_fields(source, ticket_id):
+
+    # For records about one ticket made outside its ticket_context (the $batch path).
+    return {"ticket": f"{source}:{ticket_id}"}
+
+def correlation_id():
+
+    return LOG_CONTEXT.get().get("correlation_id")
+
+def payload_text(payload, limit=None):
+
+    limit = config.LOG_PAYLOAD_LIMIT if limit is None else limit
+    text = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+    if limit and len(text) > limit:
+        return f"{text[:limit]}... ({len(text) - limit} more characters)"
+    return text
+
+def log_payload(logger, label, payload):
+
+    # Response bodies are only serialised when debug logging is on.
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s: %s", label, payload_text(payload))
+
+class ContextFilter(logging.Filter):
+
+    def filter(self, record):
+
+        context = LOG_CONTEXT.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        return True
+
+class TextFormatter(logging.Formatter):
+
+    def __init__(self):
+
+        super().__init__("%(asctime)s %(levelname)-7s %(message)s")
+
+    def format(self, record):
+
+        text = super().format(record)
+        context = " ".join(f"{field}={getattr(record, field)}" for field in CONTEXT_FIELDS if getattr(record, field, None))
+        return f"{text} [{context}]" if context else text
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for field in CONTEXT_FIELDS:
+            if getattr(record, field, None):
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging(level=None, log_format=None, path=None):
+
+    # Callers only put records on a queue; a listener thread does the
+    # formatting and the writes, so slow terminals or disks don't stall tickets.
+    global _listener, _queue
+    if _listener:
+        return
+
+    if path or config.LOG_PATH:
+        handler = logging.FileHandler(path or config.LOG_PATH)
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if (log_format or config.LOG_FORMAT) == "json" else TextFormatter())
+
+    _queue = queue.Queue()
+    queue_handler = QueueHandler(_queue)
+    queue_handler.addFilter(ContextFilter())
+    package_logger = logging.getLogger(__package__)
+    package_logger.setLevel((level or config.LOG_LEVEL).upper())
+    package_logger.addHandler(queue_handler)
+    package_logger.propagate = False
+
+    _listener = QueueListener(_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def flush_logs():
+
+    # Wait for queued records to be written, e.g. before printing a report.
+    if _queue is not None:
+        _queue.join()
+
+def stop_logging():
+
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
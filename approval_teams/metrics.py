@@ -0,0 +1,246 @@
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+MAX_SAMPLES = 10000
+
+ID_SEGMENT = re.compile(r"^(?:\d+|[0-9a-fA-F-]{16,}|[^/]+@[^/]+)$")
+KEY_SEGMENT = re.compile(r"\('[^']*'\)")
+
+def route_template(url):
+
+    segments = []
+    for segment in urlsplit(url).path.split("/"):
+        segment = KEY_SEGMENT.sub("/{id}", segment)
+        segments.append("{id}" if ID_SEGMENT.match(segment) else segment)
+    return "/".join(segments)
+
+def percentile(samples, fraction):
+
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+class Histogram:
+
+    def __init__(self):
+
+        self.count = 0
+        self.sum = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.samples = []
+
+    def observe(self, value):
+
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(value)
+        else:
+            self.samples[self.count % MAX_SAMPLES] = value
+
+    def merge(self, other):
+
+        self.count += other.count
+        self.sum += other.sum
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.samples.extend(other.samples[:MAX_SAMPLES - len(self.samples)])
+
+class Metrics:
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def inc(self, name, value=1, **labels):
+
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def phase(self, name):
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe("phase_duration_seconds", time.monotonic() - started, phase=name)
+
+    def sleep(self, seconds, reason):
+
+        with self.phase(f"sleep:{reason}"):
+            time.sleep(seconds)
+
+    def record_http(self, method, url, status, duration, bytes_sent, bytes_received):
+
+        host = urlsplit(url).netloc
+        route = route_template(url)
+        self.observe("http_request_duration_seconds", duration, host=host, method=method, route=route)
+        self.inc("http_requests_total", host=host, method=method, route=route, status=str(status))
+        self.inc("http_bytes_sent_total", bytes_sent, host=host)
+        self.inc("http_bytes_received_total", bytes_received, host=host)
+
+    def reset(self):
+
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+            self.started = time.time()
+
+    def snapshot(self):
+
+        # Raw, picklable state for handing metrics from a worker process to
+        # the coordinator; to_dict() is the reporting form.
+        with self.lock:
+            return {"counters": dict(self.counters), "histograms": dict(self.histograms)}
+
+    def merge(self, snapshot):
+
+        with self.lock:
+            for key, value in snapshot["counters"].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, other in snapshot["histograms"].items():
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram()
+                histogram.merge(other)
+
+    def to_dict(self):
+
+        with self.lock:
+            return {
+                "started": self.started,
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "histograms": [
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "count": h.count,
+                        "sum": h.sum,
+                        "p50": percentile(h.samples, 0.50),
+                        "p99": percentile(h.samples, 0.99)
+                    }
+                    for (name, labels), h in sorted(self.histograms.items())
+                ]
+            }
+
+    def to_prometheus(self):
+
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{key}="{str(value).replace(chr(34), chr(39))}"' for key, value in pairs) + "}"
+
+        lines = []
+        with self.lock:
+            seen = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE approval_teams_{name} counter")
+                    seen.add(name)
+                lines.append(f"approval_teams_{name}{label_text(labels)} {value}")
+            for (name, labels), h in sorted(self.histograms.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE approval_teams_{name} histogram")
+                    seen.add(name)
+                for bound, count in zip(DURATION_BUCKETS, h.buckets):
+                    lines.append(f"approval_teams_{name}_bucket{label_text(labels, [('le', bound)])} {count}")
+                lines.append(f"approval_teams_{name}_bucket{label_text(labels, [('le', '+Inf')])} {h.count}")
+                lines.append(f"approval_teams_{name}_sum{label_text(labels)} {h.sum}")
+                lines.append(f"approval_teams_{name}_count{label_text(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+
+        with open(path, "w") as f:
+            if path.endswith(".json"):
+                json.dump(self.to_dict(), f, indent=2)
+            else:
+                f.write(self.to_prometheus())
+
+    def serve(self, port, host="127.0.0.1"):
+
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200 if self.path.startswith("/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        print(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+    def print_summary(self):
+
+        data = self.to_dict()
+        phases = [h for h in data["histograms"] if h["name"] == "phase_duration_seconds"]
+        requests = [h for h in data["histograms"] if h["name"] == "http_request_duration_seconds"]
+        waits = [h for h in data["histograms"] if h["name"] == "work_queue_wait_seconds"]
+        counters = {}
+        for counter in data["counters"]:
+            counters.setdefault(counter["name"], []).append(counter)
+
+        print(f"{'Phase':<32} {'count':>7} {'total s':>9} {'p50 s':>8} {'p99 s':>8}")
+        for h in sorted(phases, key=lambda h: -h["sum"]):
+            print(f"{h['labels']['phase']:<32} {h['count']:>7} {h['sum']:>9.2f} {h['p50']:>8.3f} {h['p99']:>8.3f}")
+
+        if waits:
+            print(f"{'Queue wait':<32} {'count':>7} {'total s':>9} {'p50 s':>8} {'p99 s':>8}")
+            for h in sorted(waits, key=lambda h: h["labels"]["lane"]):
+                print(f"{h['labels']['lane']:<32} {h['count']:>7} {h['sum']:>9.2f} {h['p50']:>8.3f} {h['p99']:>8.3f}")
+
+        print(f"{'HTTP':<48} {'count':>7} {'total s':>9} {'p50 s':>8} {'p99 s':>8}")
+        for h in sorted(requests, key=lambda h: -h["sum"]):
+            label = f"{h['labels']['method']} {h['labels']['route']}"[:48]
+            print(f"{label:<48} {h['count']:>7} {h['sum']:>9.2f} {h['p50']:>8.3f} {h['p99']:>8.3f}")
+
+        statuses = {}
+        for counter in counters.get("http_requests_total", []):
+            statuses[counter["labels"]["status"]] = statuses.get(counter["labels"]["status"], 0) + counter["value"]
+        retries = sum(c["value"] for c in counters.get("http_retries_total", []))
+        pages = sum(c["value"] for c in counters.get("graph_pages_fetched_total", []))
+        sent = sum(c["value"] for c in counters.get("http_bytes_sent_total", []))
+        received = sum(c["value"] for c in counters.get("http_bytes_received_total", []))
+        print(f"Status codes: {', '.join(f'{s}={n}' for s, n in sorted(statuses.items())) or 'none'}; retries {retries}; "
+              f"listing pages {pages}; sent {sent / 1024:.1f} KiB; received {received / 1024:.1f} KiB")
+
+METRICS = Metrics()
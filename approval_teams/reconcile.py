@@ -0,0 +1,142 @@
+import logging
+import re
+from datetime import timezone
+
+from dateutil.parser import parse
+
+from .approval_store import RESPONDED
+from .graph_batch import GraphBatch
+
+logger = logging.getLogger(__name__)
+
+APPROVAL_FIELDS = "id,displayName,description,createdDateTime,state,result"
+OPEN_STATES = ("created", "pending")
+
+def correlation_pattern(label):
+
+    # build_approval_payload ends every description with "(<label>: <id>, Status: <status>)".
+    return re.compile(rf"\({re.escape(label)}: ([^,)]+), Status: [^)]*\)")
+
+def correlation_id(approval, pattern):
+
+    matches = pattern.findall(approval.get("description") or "")
+    return matches[-1].strip() if matches else None
+
+def index_approvals(approvals, label):
+
+    pattern = correlation_pattern(label)
+    index = {}
+    for approval in approvals:
+        ticket_id = correlation_id(approval, pattern)
+        if ticket_id is not None:
+            index.setdefault(ticket_id, []).append(approval)
+    return index
+
+def reconcile(decisions, approvals, records, label):
+
+    # decisions: {ticket_id: (ticket, desired_status)} for every open ticket we act on.
+    index = index_approvals(approvals, label)
+    report = {"missing": [], "duplicates": [], "out_of_sync": [], "in_sync": 0, "approvals": sum(len(a) for a in index.values())}
+
+    for ticket_id, (ticket, desired_status) in decisions.items():
+        key = str(ticket_id)
+        found = sorted((a for a in index.get(key, []) if a.get("state") != "canceled"), key=lambda a: parse(a["createdDateTime"]).astimezone(timezone.utc))
+        record = records.get(key)
+
+        if not found:
+            if not record or record["state"] != RESPONDED:
+                report["missing"].append({"ticket": ticket, "desired_status": desired_status, "record": record})
+            continue
+
+        keep = next((a for a in found if record and a["id"] == record["approval_id"]), found[0])
+        if len(found) > 1:
+            report["duplicates"].append({"ticket_id": key, "keep": keep, "extra": [a for a in found if a is not keep]})
+
+        completed = keep.get("state") == "completed"
+        if not record or record["approval_id"] != keep["id"] or completed != (record["state"] == RESPONDED):
+            report["out_of_sync"].append({"ticket_id": key, "ticket": ticket, "desired_status": desired_status, "approval": keep, "record": record})
+        else:
+            report["in_sync"] += 1
+
+    return report
+
+def print_reconcile_report(report):
+
+    print(f"Reconciled against {report['approvals']} correlated approvals: {report['in_sync']} in sync, "
+          f"{len(report['missing'])} missing, {len(report['duplicates'])} duplicated, {len(report['out_of_sync'])} out of sync")
+    for item in report["missing"]:
+        print(f"  missing      #{item['ticket']['id']} ({item['desired_status']})")
+    for item in report["duplicates"]:
+        print(f"  duplicate    #{item['ticket_id']}: keeping {item['keep']['id']}, extra {[a['id'] for a in item['extra']]}")
+    for item in report["out_of_sync"]:
+        record = item["record"]
+        local = f"{record['state']} {record['approval_id']}" if record else "no local record"
+        print(f"  out of sync  #{item['ticket_id']}: Graph {item['approval']['state']} {item['approval']['id']}, local {local}")
+
+def update_records(store, source, report):
+
+    for item in report["out_of_sync"]:
+        approval = item["approval"]
+        created_at = parse(approval["createdDateTime"]).astimezone(timezone.utc)
+        store.mark_created(source, item["ticket_id"], item["desired_status"], created_at, approval["id"])
+        if approval.get("state") == "completed":
+            store.mark_responded(source, item["ticket_id"], approval.get("result") or item["desired_status"])
+
+def fix_store(store, source, report):
+
+    for item in report["missing"]:
+        if item["record"]:
+            store.forget(source, item["ticket"]["id"])
+    update_records(store, source, report)
+
+def apply_approval_state(store, source, label, approval):
+
+    ticket_id = correlation_id(approval, correlation_pattern(label))
+    record = store.get(source, ticket_id) if ticket_id is not None else None
+    if not record or record["state"] == RESPONDED or approval.get("state") == "canceled":
+        return None
+    if record["approval_id"] and record["approval_id"] != approval["id"]:
+        return None
+    completed = approval.get("state") == "completed"
+    if record["approval_id"] and not completed:
+        return None
+    if not record["approval_id"]:
+        store.mark_resolved(source, ticket_id, approval["id"])
+    if completed:
+        store.mark_responded(source, ticket_id, approval.get("result") or record["desired_status"])
+    return ticket_id
+
+def sync_approval_states(store, source, label, approvals, pending=None):
+
+    if pending is None:
+        pending = {ticket_id for ticket_id, record in store.load(source).items() if record["state"] != RESPONDED}
+    pending = set(pending)
+    pattern = correlation_pattern(label)
+    updated = []
+    for approval in approvals:
+        if not pending:
+            break
+        if correlation_id(approval, pattern) in pending:
+            ticket_id = apply_approval_state(store, source, label, approval)
+            if ticket_id is not None:
+                pending.discard(ticket_id)
+                updated.append(ticket_id)
+    return updated
+
+def cancel_duplicates(graph, report):
+
+    batch = GraphBatch(graph)
+    request_ids = {}
+    for item in report["duplicates"]:
+        for approval in item["extra"]:
+            if approval.get("state") in OPEN_STATES:
+                request_ids[approval["id"]] = batch.add("POST", f"/solutions/approval/approvalItems/{approval['id']}/cancel")
+    results = batch.execute()
+
+    cancelled = 0
+    for approval_id, request_id in request_ids.items():
+        if results[request_id]["status"] in [200, 202, 204]:
+            cancelled += 1
+        else:
+            logger.warning("Failed to cancel duplicate approval %s: %s", approval_id, results[request_id]["status"])
+    return cancelled
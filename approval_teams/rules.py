@@ -0,0 +1,193 @@
+import json
+import re
+from collections import Counter
+
+DECISIONS = ("Approve", "Reject")
+INDEXABLE_OPERATORS = ("eq", "in")
+
+def field_getter(path):
+
+    if "." not in path:
+        return lambda ticket: ticket.get(path)
+
+    keys = path.split(".")
+
+    def get(ticket):
+        value = ticket
+        for key in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+    return get
+
+def as_number(value):
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def compare(test, expected):
+
+    expected = as_number(expected)
+
+    def check(value):
+        value = as_number(value)
+        return value is not None and test(value, expected)
+    return check
+
+def contains(expected):
+
+    expected = str(expected).lower()
+    return lambda value: value is not None and expected in str(value).lower()
+
+def matches(pattern):
+
+    pattern = re.compile(pattern, re.IGNORECASE)
+    return lambda value: value is not None and pattern.search(str(value)) is not None
+
+OPERATORS = {
+    "eq": lambda expected: lambda value: value == expected,
+    "ne": lambda expected: lambda value: value != expected,
+    "in": lambda expected: (lambda allowed: lambda value: value in allowed)(frozenset(expected)),
+    "not_in": lambda expected: (lambda blocked: lambda value: value not in blocked)(frozenset(expected)),
+    "gt": lambda expected: compare(lambda a, b: a > b, expected),
+    "gte": lambda expected: compare(lambda a, b: a >= b, expected),
+    "lt": lambda expected: compare(lambda a, b: a < b, expected),
+    "lte": lambda expected: compare(lambda a, b: a <= b, expected),
+    "contains": contains,
+    "matches": matches,
+    "exists": lambda expected: lambda value: (value is not None) == bool(expected),
+}
+
+def normalize_condition(spec):
+
+    # A bare value is shorthand for {"eq": value}.
+    return spec if isinstance(spec, dict) else {"eq": spec}
+
+def compile_predicate(field, operator, expected):
+
+    if operator not in OPERATORS:
+        raise Exception(f"Unknown rule operator '{operator}' on field '{field}' (expected one of {', '.join(OPERATORS)})")
+    get = field_getter(field)
+    test = OPERATORS[operator](expected)
+    return lambda ticket: test(get(ticket))
+
+class Rule:
+
+    __slots__ = ("name", "decision", "priority", "position", "when", "predicates")
+
+    def __init__(self, name, decision, when=None, priority=0, position=0):
+
+        if decision not in DECISIONS:
+            raise Exception(f"Rule '{name}' has decision '{decision}' (expected one of {', '.join(DECISIONS)})")
+        self.name = name
+        self.decision = decision
+        self.priority = priority
+        self.position = position
+        self.when = {field: normalize_condition(spec) for field, spec in (when or {}).items()}
+        self.predicates = tuple(
+            compile_predicate(field, operator, expected)
+            for field, conditions in self.when.items()
+            for operator, expected in conditions.items()
+        )
+
+    def index_keys(self, field):
+
+        conditions = self.when.get(field, {})
+        if "eq" in conditions:
+            return {conditions["eq"]}
+        if "in" in conditions:
+            return set(conditions["in"])
+        return None
+
+    def matches(self, ticket):
+
+        for predicate in self.predicates:
+            if not predicate(ticket):
+                return False
+        return True
+
+class RuleSet:
+
+    def __init__(self, rules):
+
+        # Higher priority first; equal priorities keep file order.
+        self.rules = sorted(rules, key=lambda rule: (-rule.priority, rule.position))
+        self.index_field = self.pick_index_field()
+        self.index = {}
+        self.unindexed = self.rules
+        if self.index_field:
+            self.build_index()
+
+    def pick_index_field(self):
+
+        counts = Counter(
+            field
+            for rule in self.rules
+            for field, conditions in rule.when.items()
+            if any(operator in conditions for operator in INDEXABLE_OPERATORS)
+        )
+        return counts.most_common(1)[0][0] if counts else None
+
+    def build_index(self):
+
+        # Each indexed value maps to the rules that could fire for it, already in
+        # evaluation order, so a lookup skips every rule pinned to another value.
+        get = field_getter(self.index_field)
+        self.get_index_value = get
+        self.unindexed = [rule for rule in self.rules if rule.index_keys(self.index_field) is None]
+        for rule in self.rules:
+            for key in rule.index_keys(self.index_field) or ():
+                self.index.setdefault(key, []).append(rule)
+        for key, rules in self.index.items():
+            self.index[key] = sorted(rules + self.unindexed, key=lambda rule: (-rule.priority, rule.position))
+
+    def candidates(self, ticket):
+
+        if not self.index_field:
+            return self.rules
+        try:
+            return self.index.get(self.get_index_value(ticket), self.unindexed)
+        except TypeError:
+            return self.unindexed
+
+    def match(self, ticket):
+
+        for rule in self.candidates(ticket):
+            if rule.matches(ticket):
+                return rule
+        return None
+
+    def evaluate(self, tickets):
+
+        match = self.match
+        return [(ticket, match(ticket)) for ticket in tickets]
+
+    @classmethod
+    def from_config(cls, data, source=None):
+
+        rules = []
+        for position, spec in enumerate(data.get("rules", [])):
+            sources = spec.get("sources")
+            if source and sources and source not in sources:
+                continue
+            rules.append(Rule(spec.get("name") or f"rule-{position + 1}", spec["decision"], spec.get("when"), spec.get("priority", 0), position))
+        return cls(rules)
+
+    @classmethod
+    def from_status_map(cls, status_map):
+
+        ids_by_decision = {}
+        for ticket_id, decision in status_map.items():
+            ids_by_decision.setdefault(decision, []).append(ticket_id)
+        return cls([
+            Rule(f"ticket_status_map:{decision}", decision, {"id": {"in": ids}}, position=position)
+            for position, (decision, ids) in enumerate(ids_by_decision.items())
+        ])
+
+def load_rules(path, source=None):
+
+    with open(path, "r") as f:
+        return RuleSet.from_config(json.load(f), source)
@@ -0,0 +1,87 @@
+import json
+import time
+from datetime import datetime, timezone
+
+from .rules import compile_predicate, normalize_condition
+
+SECONDS_PER_HOUR = 3600.0
+
+def timestamp(value):
+
+    # Epoch seconds (or milliseconds) and ISO 8601 strings; None if unreadable.
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e11 else float(value)
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return None
+
+class PriorityRule:
+
+    __slots__ = ("name", "priority", "deadline", "predicates")
+
+    def __init__(self, name, priority=0, deadline=None, when=None):
+
+        self.name = name
+        self.priority = priority
+        self.deadline = deadline
+        self.predicates = tuple(
+            compile_predicate(field, operator, expected)
+            for field, spec in (when or {}).items()
+            for operator, expected in normalize_condition(spec).items()
+        )
+
+    def matches(self, ticket):
+
+        for predicate in self.predicates:
+            if not predicate(ticket):
+                return False
+        return True
+
+class SchedulePolicy:
+
+    # Unlike decision rules, every matching rule counts: priorities add up, so
+    # "request type" and "technician" rules combine, and the tightest deadline
+    # wins. Waiting raises a ticket's priority by age_weight per hour, counted
+    # from age_field on the ticket when it has one, else from when it was queued.
+
+    def __init__(self, rules=(), age_field=None, age_weight=0.0):
+
+        self.rules = list(rules)
+        self.age_field = age_field
+        self.age_weight = age_weight
+
+    def assess(self, ticket, now=None):
+
+        now = time.time() if now is None else now
+        priority = 0
+        deadline = None
+        for rule in self.rules:
+            if rule.matches(ticket):
+                priority += rule.priority
+                if rule.deadline is not None:
+                    deadline = min(deadline or float("inf"), now + rule.deadline)
+        aged_from = timestamp(ticket.get(self.age_field)) if self.age_field else None
+        return priority, deadline, min(aged_from or now, now)
+
+    @classmethod
+    def from_config(cls, data, source=None):
+
+        rules = []
+        for position, spec in enumerate(data.get("rules", [])):
+            sources = spec.get("sources")
+            if source and sources and source not in sources:
+                continue
+            deadline = spec.get("deadline_minutes")
+            rules.append(PriorityRule(spec.get("name") or f"priority-{position + 1}", spec.get("priority", 0), None if deadline is None else deadline * 60, spec.get("when")))
+        return cls(rules, data.get("age_field"), data.get("age_weight", 0.0))
+
+def load_schedule(path, source=None):
+
+    with open(path, "r") as f:
+        return SchedulePolicy.from_config(json.load(f), source)
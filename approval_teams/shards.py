@@ -0,0 +1,228 @@
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from contextlib import contextmanager
+
+from . import config
+from .logs import configure_logging, flush_logs, log_context
+from .metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+SHARD_FIELDS = ("tenant", "source", "approver")
+
+def load_shards(path, state_dir=None):
+
+    # {"defaults": {...settings...}, "shards": [{"tenant", "source", "approver",
+    # "name"?, "settings"?}]}; settings use the names from config.py.
+    state_dir = state_dir or config.SHARD_STATE_DIR
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    defaults = data.get("defaults", {})
+    shards = []
+    names = set()
+    for position, spec in enumerate(data.get("shards", [])):
+        missing = [field for field in SHARD_FIELDS if not spec.get(field)]
+        if missing:
+            raise Exception(f"Shard {position + 1} in {path} is missing {', '.join(missing)}")
+        name = spec.get("name") or f"{spec['tenant']}-{spec['source']}"
+        if name in names:
+            raise Exception(f"Duplicate shard name '{name}' in {path}")
+        names.add(name)
+
+        # Login and approver caches are per tenant, stores and source tokens per shard.
+        tenant_dir = os.path.join(state_dir, spec["tenant"])
+        settings = {
+            **defaults,
+            "TENANT_ID": spec["tenant"],
+            "APPROVER_EMAIL": spec["approver"],
+            "TOKEN_CACHE_PATH": os.path.join(tenant_dir, "token_cache.json"),
+            "APPROVER_CACHE_PATH": os.path.join(tenant_dir, "approvers.json"),
+            "APPROVAL_STORE_PATH": os.path.join(tenant_dir, f"{name}.db"),
+            "SOURCE_TOKEN_CACHE_PATH": os.path.join(tenant_dir, f"{name}.source_token.json"),
+            **spec.get("settings", {})
+        }
+        unknown = [key for key in settings if not key.isupper() or not hasattr(config, key)]
+        if unknown:
+            raise Exception(f"Shard '{name}' in {path} has unknown settings: {', '.join(unknown)}")
+        try:
+            settings = {key: config.parse_setting(key, value) for key, value in settings.items()}
+        except Exception as e:
+            raise Exception(f"Shard '{name}' in {path}: {e}")
+        shards.append({"name": name, "tenant": spec["tenant"], "source": spec["source"], "settings": settings})
+    return shards
+
+def group_by_tenant(shards):
+
+    groups = {}
+    for shard in shards:
+        groups.setdefault(shard["tenant"], []).append(shard)
+    return list(groups.values())
+
+class PrefixedOutput:
+
+    # Several workers share the terminal; tag each line with its shard.
+
+    def __init__(self, stream, prefix):
+
+        self.stream = stream
+        self.prefix = prefix
+        self.pending = ""
+
+    def write(self, text):
+
+        lines = (self.pending + text).split("\n")
+        self.pending = lines.pop()
+        for line in lines:
+            self.stream.write(f"[{self.prefix}] {line}\n")
+        return len(text)
+
+    def flush(self):
+
+        if self.pending:
+            self.stream.write(f"[{self.prefix}] {self.pending}\n")
+            self.pending = ""
+        self.stream.flush()
+
+class ShardRun:
+
+    # One shard inside a tenant worker. Every step switches the process over
+    # to the shard's settings and output prefix, and switches back afterwards.
+
+    def __init__(self, shard, incremental):
+
+        self.shard = shard
+        self.incremental = incremental
+        self.context = None
+        self.sync = None
+        self.results = []
+        self.error = None
+        self.duration = 0.0
+
+    @contextmanager
+    def active(self):
+
+        previous = config.apply(self.shard["settings"])
+        stdout = sys.stdout
+        sys.stdout = PrefixedOutput(stdout, self.shard["name"])
+        started = time.monotonic()
+        try:
+            with log_context(shard=self.shard["name"]):
+                yield
+        except Exception as e:
+            self.error = str(e)
+            logger.error("Error: %s", e, extra={"shard": self.shard["name"]})
+        finally:
+            self.duration += time.monotonic() - started
+            flush_logs()
+            sys.stdout.flush()
+            sys.stdout = stdout
+            config.apply(previous)
+
+    def start(self):
+
+        from .cli import setup, start_work
+        from .delta_sync import DeltaSync
+        from .sources import build_source
+
+        with self.active():
+            os.makedirs(os.path.dirname(config.APPROVAL_STORE_PATH) or ".", exist_ok=True)
+            source = build_source(self.shard["source"])
+            self.context = setup(source)
+            if self.incremental or config.INCREMENTAL_SYNC:
+                self.sync = DeltaSync(self.context["store"], source.name)
+            return start_work(self.context, self.sync)
+        return False
+
+    def step(self):
+
+        from .cli import process_next
+
+        with self.active():
+            batch = process_next(self.context)
+            if batch is not None:
+                self.results.extend(batch)
+                return True
+        return False
+
+    def finish(self, had_work):
+
+        from .cli import finish_work
+
+        if self.context is None:
+            return
+        with self.active():
+            if had_work:
+                finish_work(self.context, self.results)
+            if self.sync and not self.error:
+                self.sync.commit(failed_ids=[r["id"] for r in self.results if r["error"] or not r["responded"]])
+        self.context["store"].close()
+
+    def summary(self):
+
+        return {
+            "name": self.shard["name"],
+            "tenant": self.shard["tenant"],
+            "source": self.shard["source"],
+            "processed": len(self.results),
+            "responded": sum(1 for r in self.results if r["responded"]),
+            "failed": sum(1 for r in self.results if r["error"]),
+            "duration": self.duration,
+            "error": self.error
+        }
+
+def run_tenant(task):
+
+    # Runs in a fresh worker process, so HTTP pools, the Graph throttle, the
+    # MSAL token and the approver cache belong to this one tenant. The
+    # tenant's sources take turns claiming a batch each, so a backlog in one
+    # source cannot hold up urgent tickets from another.
+    shards, incremental = task
+    configure_logging()
+    METRICS.reset()
+    runs = [ShardRun(shard, incremental) for shard in shards]
+    started = {id(run): run.start() for run in runs}
+    active = [run for run in runs if started[id(run)]]
+    while active:
+        for run in list(active):
+            if not run.step():
+                active.remove(run)
+    for run in runs:
+        run.finish(started[id(run)])
+    return [run.summary() for run in runs], METRICS.snapshot()
+
+def ignore_interrupts():
+
+    # The coordinator handles Ctrl+C; workers finish the tenant they are on.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def run_shards(shards, workers=None, incremental=False):
+
+    groups = group_by_tenant(shards)
+    if not groups:
+        return []
+    workers = min(workers or config.SHARD_WORKERS or os.cpu_count() or 1, len(groups))
+    logger.info("Running %d shards for %d tenants on %d worker processes", len(shards), len(groups), workers)
+
+    summaries = []
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, initializer=ignore_interrupts, maxtasksperchild=1) as pool:
+        for tenant_summaries, metrics in pool.imap_unordered(run_tenant, [(group, incremental) for group in groups]):
+            METRICS.merge(metrics)
+            for summary in tenant_summaries:
+                METRICS.inc("shard_runs_total", outcome="error" if summary["error"] else "ok")
+                summaries.append(summary)
+    return summaries
+
+def print_shard_summary(summaries):
+
+    flush_logs()
+    print(f"{'Shard':<32} {'tenant':<24} {'processed':>9} {'responded':>9} {'failed':>6} {'s':>7}")
+    for s in sorted(summaries, key=lambda s: s["name"]):
+        print(f"{s['name']:<32} {s['tenant']:<24} {s['processed']:>9} {s['responded']:>9} {s['failed']:>6} {s['duration']:>7.1f}" + (f"  error: {s['error']}" if s["error"] else ""))
+    print(f"Shards: {len(summaries)} run, {sum(1 for s in summaries if s['error'])} failed; {sum(s['processed'] for s in summaries)} tickets processed, {sum(s['responded'] for s in summaries)} responded")
@@ -0,0 +1,109 @@
+import base64
+import json
+import logging
+import os
+import threading
+import time
+
+from .metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+REFRESH_MARGIN_SECONDS = 60
+DEFAULT_TOKEN_LIFETIME = 3600
+
+def jwt_expiry(token):
+
+    # Only the exp claim is needed and the server checks the signature, so the
+    # payload is decoded without verification. Opaque tokens return None.
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(parts[1] + "=" * (-len(parts[1]) % 4)))
+        return float(payload["exp"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+class SessionTokenProvider:
+
+    # Bearer token for a ticket-source API. The login callable is only used when
+    # there is no unexpired token in memory or in the cache file.
+
+    def __init__(self, login, key, cache_path=None, refresh_margin=REFRESH_MARGIN_SECONDS, default_lifetime=DEFAULT_TOKEN_LIFETIME):
+
+        self.login = login
+        self.key = key
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+        self.default_lifetime = default_lifetime
+        self.access_token = None
+        self.expires_at = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+
+        return self.token()
+
+    def valid(self):
+
+        return self.access_token is not None and time.time() < self.expires_at - self.refresh_margin
+
+    def token(self):
+
+        with self.lock:
+            if not self.valid():
+                self.load()
+            if not self.valid():
+                with METRICS.phase("source_login"):
+                    self.set_token(self.login())
+                METRICS.inc("source_logins_total")
+                self.save()
+            return self.access_token
+
+    def set_token(self, token):
+
+        self.access_token = token
+        self.expires_at = jwt_expiry(token) or time.time() + self.default_lifetime
+
+    def invalidate(self, token):
+
+        # Called after a 401; only drop the token if nobody has replaced it yet.
+        with self.lock:
+            if token == self.access_token:
+                self.access_token = None
+                self.expires_at = 0
+                self.save()
+
+    def load(self):
+
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r") as f:
+                entry = json.load(f).get(self.key)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable session token cache %s: %s", self.cache_path, e)
+            return
+        if entry:
+            self.access_token = entry["token"]
+            self.expires_at = entry["expires_at"]
+
+    def save(self):
+
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        if self.access_token:
+            entries[self.key] = {"token": self.access_token, "expires_at": self.expires_at}
+        else:
+            entries.pop(self.key, None)
+        tmp_path = f"{self.cache_path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.cache_path)
@@ -0,0 +1,216 @@
+import logging
+from collections.abc import Mapping
+
+import requests
+
+from . import config
+from .http_client import get_client
+from .json_stream import iter_array_member
+from .metrics import METRICS
+from .rules import RuleSet, load_rules
+from .source_auth import SessionTokenProvider
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+class TicketSource:
+
+    # name keys the approval store; the rest only changes wording and matching.
+    name = None
+    noun = "ticket"
+    plural = "tickets"
+    id_label = "Ticket ID"
+    open_status = "open"
+    match_window = 30
+    list_fallback_delay = 0
+    # Built-in decisions used when no DECISION_RULES_PATH is configured.
+    status_map = {}
+    rules = None
+
+    def fetch(self):
+
+        raise NotImplementedError
+
+    def decision_rules(self):
+
+        if self.rules is None:
+            self.rules = RuleSet.from_status_map(self.status_map)
+        return self.rules
+
+    def decisions(self, tickets):
+
+        open_tickets = [ticket for ticket in tickets if ticket.get("status") == self.open_status]
+        decisions = []
+        fired = {}
+        for ticket, rule in self.decision_rules().evaluate(open_tickets):
+            if rule is None:
+                logger.info("Skipping %s ID %s: %s (no decision rule matched)", self.noun, ticket["id"], ticket["title"])
+                continue
+            decisions.append((ticket, rule.decision, rule.name))
+            fired[rule.name] = fired.get(rule.name, 0) + 1
+        for name, count in fired.items():
+            METRICS.inc("decision_rule_matches_total", count, rule=name)
+        METRICS.inc("decision_rule_matches_total", len(open_tickets) - len(decisions), rule="none")
+        if open_tickets:
+            logger.info("Decision rules: %s; %d unmatched", ", ".join(f"{name}={count}" for name, count in fired.items()) or "none fired", len(open_tickets) - len(decisions))
+        return decisions
+
+class FlyTicketsSource(TicketSource):
+
+    name = "fly-tickets"
+    status_map = {
+        2: "Approve",
+        3: "Reject"
+    }
+
+    def __init__(self, url):
+
+        self.url = url
+
+    def fetch(self):
+
+        try:
+            response = get_client(self.url).get(self.url)
+            if response.status_code == 200:
+                return response.json()
+            else:
+                raise Exception(f"Failed to fetch tickets: {response.status_code} - {response.text}")
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Tickets API request failed: {str(e)}")
+
+class UniformRequest(Mapping):
+
+    # Reads like the ticket dicts the other sources return, but holds only the
+    # raw fields; title and description are formatted when something asks.
+    __slots__ = ("id", "status", "technician", "notes")
+    KEYS = ("id", "title", "description", "status", "technician")
+
+    def __init__(self, id, status, technician, notes):
+
+        self.id = id
+        self.status = status
+        self.technician = technician
+        self.notes = notes
+
+    @property
+    def title(self):
+
+        return f"Uniform Request #{self.id} by {self.technician}"
+
+    @property
+    def description(self):
+
+        return self.notes or "No notes provided"
+
+    def __getitem__(self, key):
+
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+
+        return iter(self.KEYS)
+
+    def __len__(self):
+
+        return len(self.KEYS)
+
+    def __repr__(self):
+
+        return f"UniformRequest(id={self.id!r}, status={self.status!r}, technician={self.technician!r})"
+
+class UniformRequestsSource(TicketSource):
+
+    name = "uniform-requests"
+    noun = "request"
+    plural = "uniform requests"
+    id_label = "Request ID"
+    open_status = "Submitted"
+    match_window = 120
+    list_fallback_delay = 2
+    status_map = {
+        5: "Approve",
+        4: "Reject",
+        3: "Approve",
+        2: "Approve",
+        1: "Reject"
+    }
+
+    def __init__(self, base_url, username, password, token_cache_path=None):
+
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.tokens = SessionTokenProvider(self.login, f"{username}@{base_url}", cache_path=token_cache_path)
+
+    def login(self):
+
+        payload = {
+            "username": self.username,
+            "password": self.password
+        }
+        try:
+            response = get_client(self.base_url).post(f"{self.base_url}/api/mobile/v3.0/login", json=payload)
+            if response.status_code == 200:
+                data = response.json()
+                token = data.get("token")
+                if not token:
+                    raise Exception("No token found in login response")
+                return token
+            else:
+                raise Exception(f"Login failed: {response.status_code} - {response.text}")
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Login request failed: {str(e)}")
+
+    def get(self, path, **kwargs):
+
+        # The cached token can be revoked server-side before it expires; log in
+        # again once on a 401 rather than failing the whole fetch.
+        tickets_api = get_client(self.base_url)
+        token = self.tokens.token()
+        response = tickets_api.get(f"{self.base_url}{path}", headers={"Authorization": f"Bearer {token}"}, **kwargs)
+        if response.status_code != 401:
+            return response
+        response.close()
+        logger.warning("Ticket API session token was rejected, logging in again")
+        self.tokens.invalidate(token)
+        return tickets_api.get(f"{self.base_url}{path}", headers={"Authorization": f"Bearer {self.tokens.token()}"}, **kwargs)
+
+    def fetch(self):
+
+        # The endpoint returns every request ever made, so the body is parsed as
+        # it arrives and only open requests are kept.
+        try:
+            with self.get("/api/mobile/v3.0/uniform-requests/all", stream=True) as response:
+                if response.status_code != 200:
+                    raise Exception(f"Failed to fetch uniform requests: {response.status_code} - {response.text}")
+                members = {}
+                tickets = [
+                    UniformRequest(req["requestId"], req["status"], req["technicianName"], req["notes"])
+                    for req in iter_array_member(response.iter_content(chunk_size=STREAM_CHUNK_SIZE), "data", members)
+                    if req["status"] == self.open_status
+                ]
+            if members.get("status") != "OK":
+                raise Exception(f"API error: {members.get('message', 'Unknown error')}")
+            return tickets
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Uniform requests API request failed: {str(e)}")
+
+SOURCES = {
+    FlyTicketsSource.name: FlyTicketsSource,
+    UniformRequestsSource.name: UniformRequestsSource
+}
+
+def build_source(name):
+
+    if name == FlyTicketsSource.name:
+        source = FlyTicketsSource(config.TICKETS_API_URL)
+    elif name == UniformRequestsSource.name:
+        source = UniformRequestsSource(config.API_BASE_URL, config.API_USERNAME, config.API_PASSWORD, config.SOURCE_TOKEN_CACHE_PATH)
+    else:
+        raise Exception(f"Unknown ticket source: {name} (expected one of {', '.join(SOURCES)})")
+    if config.DECISION_RULES_PATH:
+        source.rules = load_rules(config.DECISION_RULES_PATH, source.name)
+    return source
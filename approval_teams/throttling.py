@@ -0,0 +1,102 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from .metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+THROTTLED_STATUS_CODES = (429, 503)
+
+def parse_retry_after(value):
+
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class AdaptiveThrottle:
+
+    def __init__(self, max_concurrency=16, min_concurrency=1, max_retries=5, base_delay=1.0, max_delay=60.0, decrease_factor=0.5):
+
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+
+        started = time.monotonic()
+        with self.condition:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    break
+                self.condition.wait(timeout=wait if wait > 0 else None)
+            self.in_flight += 1
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            METRICS.observe("phase_duration_seconds", waited, phase="sleep:throttle")
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.in_flight -= 1
+                self.condition.notify_all()
+
+    def on_success(self):
+
+        with self.condition:
+            # Additive increase: roughly one extra slot per window of successes.
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / max(self.limit, 1.0))
+            self.condition.notify_all()
+
+    def on_throttled(self, delay):
+
+        with self.condition:
+            self.throttled += 1
+            self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+    def backoff_delay(self, attempt, retry_after=None):
+
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def send(self, send_request):
+
+        for attempt in range(self.max_retries + 1):
+            with self.slot():
+                response = send_request()
+            if response.status_code not in THROTTLED_STATUS_CODES:
+                self.on_success()
+                return response
+            if attempt == self.max_retries:
+                break
+            delay = self.backoff_delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+            self.on_throttled(delay)
+            METRICS.inc("http_retries_total", status=str(response.status_code))
+            logger.info("Throttled with %s; retrying in %.1fs (concurrency limit now %d)", response.status_code, delay, int(self.limit))
+        return response
@@ -0,0 +1,64 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .metrics import METRICS
+
+def new_result(ticket, desired_status):
+
+    return {
+        "id": ticket["id"],
+        "title": ticket["title"],
+        "desired_status": desired_status,
+        "approval_id": None,
+        "responded": False,
+        "error": None,
+        "duration": 0.0
+    }
+
+def run_ticket(handler, ticket, desired_status, stop_event=None):
+
+    started = time.monotonic()
+    result = new_result(ticket, desired_status)
+    if stop_event and stop_event.is_set():
+        result["error"] = "Not started: shutting down"
+        return result
+    try:
+        result.update(handler(ticket, desired_status) or {})
+    except Exception as e:
+        result["error"] = str(e)
+    result["duration"] = time.monotonic() - started
+    METRICS.observe("ticket_duration_seconds", result["duration"])
+    return result
+
+def run_tickets(work, handler, max_workers=1, stop_event=None):
+
+    if max_workers <= 1 or len(work) <= 1:
+        return [run_ticket(handler, ticket, desired_status, stop_event) for ticket, desired_status in work]
+
+    results = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(work)), thread_name_prefix="ticket") as executor:
+        # Each ticket runs in a copy of the caller's context, so its log
+        # records keep the shard the ticket belongs to.
+        futures = [executor.submit(contextvars.copy_context().run, run_ticket, handler, ticket, desired_status, stop_event) for ticket, desired_status in work]
+        for future in as_completed(futures):
+            results.append(future.result())
+    return results
+
+def print_summary(results):
+
+    responded = [r for r in results if r["responded"]]
+    unresolved = [r for r in results if not r["error"] and not r["responded"]]
+    failed = [r for r in results if r["error"]]
+
+    print(f"Processed {len(results)} tickets: {len(responded)} responded, {len(unresolved)} need manual action, {len(failed)} failed")
+    for r in sorted(results, key=lambda r: str(r["id"])):
+        if r["error"]:
+            outcome = f"error: {r['error']}"
+        elif r["responded"]:
+            outcome = f"{r['desired_status']} -> {r['approval_id']}"
+        elif r["approval_id"]:
+            outcome = f"response failed for {r['approval_id']}"
+        else:
+            outcome = "approval ID not found"
+        print(f"  #{r['id']} ({r['duration']:.1f}s) {outcome}")
@@ -0,0 +1,248 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from .approval_store import utc_now
+from .metrics import METRICS
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+DEAD = "dead"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_queue (
+    source TEXT NOT NULL,
+    ticket_id TEXT NOT NULL,
+    ticket TEXT NOT NULL,
+    desired_status TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    available_at REAL NOT NULL,
+    last_error TEXT,
+    priority REAL NOT NULL DEFAULT 0,
+    deadline REAL,
+    aged_from REAL,
+    enqueued_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (source, ticket_id)
+);
+CREATE INDEX IF NOT EXISTS work_queue_ready ON work_queue (source, status, available_at);
+"""
+
+# Columns added after the table first shipped; older queue files get them on open.
+MIGRATIONS = {
+    "priority": "ALTER TABLE work_queue ADD COLUMN priority REAL NOT NULL DEFAULT 0",
+    "deadline": "ALTER TABLE work_queue ADD COLUMN deadline REAL",
+    "aged_from": "ALTER TABLE work_queue ADD COLUMN aged_from REAL",
+}
+
+DEADLINE_HORIZON_SECONDS = 300
+
+def new_owner():
+
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def queue_lane(row):
+
+    if row["deadline"] is not None:
+        return "deadline"
+    return "priority" if row["priority"] > 0 else "normal"
+
+class WorkQueue:
+
+    # Rows sit next to the approvals table in the same SQLite file: "fetched"
+    # tickets wait here, and the created/resolved/responded progress of each
+    # one is tracked by ApprovalStore, so a reclaimed ticket resumes from there.
+    #
+    # Claims come out in scheduling order: tickets whose deadline falls within
+    # deadline_horizon first (earliest deadline first), then by priority plus
+    # the policy's aging bonus, then first come first served. Without a policy
+    # every ticket has priority 0 and the queue stays FIFO.
+
+    def __init__(self, store, lease_seconds=60, max_attempts=5, base_delay=30.0, max_delay=3600.0, policy=None, deadline_horizon=DEADLINE_HORIZON_SECONDS):
+
+        self.store = store
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.policy = policy
+        self.deadline_horizon = deadline_horizon
+        self.owner = new_owner()
+        with store.lock:
+            columns = {row["name"] for row in store.conn.execute("PRAGMA table_info(work_queue)")}
+            for column, statement in MIGRATIONS.items():
+                if columns and column not in columns:
+                    store.conn.execute(statement)
+            store.conn.executescript(SCHEMA)
+
+    def assess(self, ticket, now):
+
+        if self.policy is None:
+            return 0, None, now
+        return self.policy.assess(ticket, now)
+
+    def enqueue(self, source, work):
+
+        now = time.time()
+        stamp = utc_now()
+        rows = []
+        for ticket, desired_status in work:
+            priority, deadline, aged_from = self.assess(ticket, now)
+            rows.append((source, str(ticket["id"]), json.dumps(dict(ticket), default=str), desired_status, QUEUED, now, priority, deadline, aged_from, stamp, stamp))
+        with self.store.lock:
+            self.store.conn.execute("BEGIN IMMEDIATE")
+            # A ticket that is still pending keeps its original deadline and age.
+            self.store.conn.executemany(
+                """
+                INSERT INTO work_queue (source, ticket_id, ticket, desired_status, status, available_at, priority, deadline, aged_from, enqueued_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source, ticket_id) DO UPDATE SET
+                    ticket = excluded.ticket,
+                    desired_status = excluded.desired_status,
+                    priority = excluded.priority,
+                    deadline = CASE WHEN work_queue.status = 'done' THEN excluded.deadline ELSE COALESCE(work_queue.deadline, excluded.deadline) END,
+                    aged_from = CASE WHEN work_queue.status = 'done' THEN excluded.aged_from ELSE COALESCE(work_queue.aged_from, excluded.aged_from) END,
+                    status = CASE WHEN work_queue.status = 'done' THEN 'queued' ELSE work_queue.status END,
+                    attempts = CASE WHEN work_queue.status = 'done' THEN 0 ELSE work_queue.attempts END,
+                    available_at = CASE WHEN work_queue.status = 'done' THEN excluded.available_at ELSE work_queue.available_at END,
+                    updated_at = excluded.updated_at
+                """,
+                rows
+            )
+            self.store.conn.execute("COMMIT")
+
+    def claim(self, source, limit):
+
+        now = time.time()
+        horizon = now + self.deadline_horizon
+        age_weight = self.policy.age_weight if self.policy else 0.0
+        with self.store.lock:
+            self.store.conn.execute("BEGIN IMMEDIATE")
+            rows = self.store.conn.execute(
+                """
+                SELECT ticket_id, ticket, desired_status, attempts, priority, deadline,
+                       CASE WHEN status = ? THEN available_at ELSE lease_expires END AS ready_at
+                FROM work_queue
+                WHERE source = ? AND ((status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?))
+                ORDER BY
+                    CASE WHEN deadline <= ? THEN deadline END IS NULL,
+                    CASE WHEN deadline <= ? THEN deadline END,
+                    priority + ? * (? - COALESCE(aged_from, available_at)) / 3600.0 DESC,
+                    available_at, enqueued_at, rowid
+                LIMIT ?
+                """,
+                (QUEUED, source, QUEUED, now, LEASED, now, horizon, horizon, age_weight, now, limit)
+            ).fetchall()
+            self.store.conn.executemany(
+                "UPDATE work_queue SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? WHERE source = ? AND ticket_id = ?",
+                [(LEASED, self.owner, now + self.lease_seconds, utc_now(), source, row["ticket_id"]) for row in rows]
+            )
+            self.store.conn.execute("COMMIT")
+
+        for row in rows:
+            METRICS.observe("work_queue_wait_seconds", max(0.0, now - row["ready_at"]), lane=queue_lane(row))
+            if row["deadline"] is not None and row["deadline"] < now:
+                METRICS.inc("work_queue_deadlines_missed_total")
+        return [
+            {"ticket": json.loads(row["ticket"]), "desired_status": row["desired_status"], "attempts": row["attempts"] + 1}
+            for row in rows
+        ]
+
+    def extend(self, source, ticket_ids):
+
+        with self.store.lock:
+            self.store.conn.executemany(
+                "UPDATE work_queue SET lease_expires = ? WHERE source = ? AND ticket_id = ? AND status = ? AND lease_owner = ?",
+                [(time.time() + self.lease_seconds, source, str(ticket_id), LEASED, self.owner) for ticket_id in ticket_ids]
+            )
+
+    @contextmanager
+    def heartbeat(self, source, ticket_ids):
+
+        stop_event = threading.Event()
+
+        def beat():
+            while not stop_event.wait(self.lease_seconds / 3):
+                self.extend(source, ticket_ids)
+
+        thread = threading.Thread(target=beat, name="queue-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop_event.set()
+            thread.join()
+
+    def complete(self, source, ticket_id):
+
+        return self.set_status(source, ticket_id, DONE, None, time.time())
+
+    def release(self, source, ticket_id):
+
+        # Claimed but never started (shutdown): hand back without using an attempt.
+        with self.store.lock:
+            self.store.conn.execute(
+                "UPDATE work_queue SET status = ?, attempts = MAX(attempts - 1, 0), lease_owner = NULL, lease_expires = NULL, updated_at = ? WHERE source = ? AND ticket_id = ? AND lease_owner = ?",
+                (QUEUED, utc_now(), source, str(ticket_id), self.owner)
+            )
+
+    def backoff_delay(self, attempts):
+
+        # Half fixed, half jitter, so a failed ticket is never retried straight away.
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def fail(self, source, ticket_id, attempts, error):
+
+        # None if the lease was lost, i.e. another worker has the ticket now.
+        if attempts >= self.max_attempts:
+            return DEAD if self.set_status(source, ticket_id, DEAD, error, time.time()) else None
+        return QUEUED if self.set_status(source, ticket_id, QUEUED, error, time.time() + self.backoff_delay(attempts)) else None
+
+    def set_status(self, source, ticket_id, status, error, available_at):
+
+        # Only the lease holder may settle a ticket. A worker that stalled past
+        # its lease must not reset a row another worker has since reclaimed.
+        with self.store.lock:
+            cursor = self.store.conn.execute(
+                """
+                UPDATE work_queue SET status = ?, last_error = ?, available_at = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?
+                WHERE source = ? AND ticket_id = ? AND status = ? AND lease_owner = ?
+                """,
+                (status, error, available_at, utc_now(), source, str(ticket_id), LEASED, self.owner)
+            )
+        return cursor.rowcount > 0
+
+    def requeue_dead(self, source):
+
+        with self.store.lock:
+            cursor = self.store.conn.execute(
+                "UPDATE work_queue SET status = ?, attempts = 0, available_at = ?, updated_at = ? WHERE source = ? AND status = ?",
+                (QUEUED, time.time(), utc_now(), source, DEAD)
+            )
+        return cursor.rowcount
+
+    def ready_count(self, source):
+
+        now = time.time()
+        with self.store.lock:
+            row = self.store.conn.execute(
+                "SELECT COUNT(*) AS n FROM work_queue WHERE source = ? AND ((status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?))",
+                (source, QUEUED, now, LEASED, now)
+            ).fetchone()
+        return row["n"]
+
+    def counts(self, source):
+
+        with self.store.lock:
+            rows = self.store.conn.execute("SELECT status, COUNT(*) AS n FROM work_queue WHERE source = ? GROUP BY status", (source,)).fetchall()
+        return {row["status"]: row["n"] for row in rows}
@@ -0,0 +1,102 @@
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from approval_teams.approval_store import ApprovalStore
+from approval_teams.approver_directory import ApproverDirectory
+from approval_teams.client import ApprovalClient
+from approval_teams.http_client import DEFAULT_POOL_SIZE, get_client
+from approval_teams.logs import configure_logging
+from approval_teams.metrics import percentile
+from approval_teams.sources import SOURCES, FlyTicketsSource, UniformRequestsSource
+from approval_teams.throttling import AdaptiveThrottle
+from approval_teams.ticket_pipeline import run_tickets
+from bench.mock_server import MockState, start_mock_server
+
+def mock_source(name, base_url):
+
+    if name == FlyTicketsSource.name:
+        return FlyTicketsSource(f"{base_url}/tickets")
+    return UniformRequestsSource(base_url, "bench", "bench")
+
+def run_benchmark(args):
+
+    state = MockState(args.latency, args.page_size, args.consistency_delay, args.throttle_rate, args.retry_after, seed=args.seed)
+    state.seed(existing_approvals=args.existing, uniform_requests=args.tickets, tickets=args.tickets)
+    server, base_url = start_mock_server(state)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = mock_source(args.source, base_url)
+        graph = get_client(base_url, pool_size=max(args.concurrency, DEFAULT_POOL_SIZE), throttle=AdaptiveThrottle(max_concurrency=max(args.concurrency, 1)))
+        graph.set_bearer_token("mock-graph-token")
+        store = ApprovalStore(os.path.join(tmp, "bench.db"))
+        client = ApprovalClient(graph, source, store, ApproverDirectory(graph))
+        approver = client.directory.resolve("approver@example.com")
+
+        output = io.StringIO()
+        started = time.monotonic()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+            tickets = [t for t in source.fetch() if t["status"] == source.open_status][:args.tickets]
+            work = [(ticket, "Approve") for ticket in tickets]
+            if args.batch:
+                results = client.process_tickets_batched({}, {ticket["id"]: approver for ticket in tickets}, work)
+            else:
+                def handle(ticket, desired_status):
+                    return client.create_approval(*approver, ticket, desired_status)
+                results = run_tickets(work, handle, max_workers=args.concurrency)
+        elapsed = time.monotonic() - started
+
+        store.close()
+    server.shutdown()
+    return results, elapsed, state.stats()
+
+def print_report(args, results, elapsed, stats):
+
+    durations = [r["duration"] for r in results]
+    responded = sum(1 for r in results if r["responded"])
+    failed = sum(1 for r in results if r["error"])
+
+    mode = "batch" if args.batch else f"{args.concurrency} workers"
+    print(f"Benchmark: {len(results)} tickets vs {args.existing} existing approvals ({args.source}, {mode})")
+    print(f"  mock latency {args.latency * 1000:.0f} ms, page size {args.page_size}, consistency delay {args.consistency_delay}s, 429 rate {args.throttle_rate:.0%}")
+    print(f"  elapsed        {elapsed:8.2f} s")
+    print(f"  throughput     {len(results) / elapsed if elapsed else 0:8.2f} tickets/s")
+    print(f"  latency p50    {percentile(durations, 0.50):8.3f} s")
+    print(f"  latency p99    {percentile(durations, 0.99):8.3f} s")
+    print(f"  latency mean   {statistics.mean(durations) if durations else 0:8.3f} s")
+    print(f"  responded      {responded:8d}")
+    print(f"  failed         {failed:8d}")
+    print(f"  HTTP requests  {stats['total']:8d} ({stats['total'] / len(results) if results else 0:.1f} per ticket)")
+    for route, count in sorted(stats["requests"].items()):
+        throttled = stats["throttled"].get(route, 0)
+        print(f"    {route:<20} {count:6d}" + (f" ({throttled} throttled)" if throttled else ""))
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Measure the create -> resolve -> respond path against the local mock server.")
+    parser.add_argument("--source", choices=sorted(SOURCES), default="uniform-requests")
+    parser.add_argument("--tickets", type=int, default=50, help="N tickets to process")
+    parser.add_argument("--existing", type=int, default=1000, help="M approvals already in the tenant")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--batch", action="store_true", help="use the $batch path")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every mock request")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--consistency-delay", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own output")
+    args = parser.parse_args()
+    if args.verbose:
+        configure_logging()
+
+    results, elapsed, stats = run_benchmark(args)
+    print_report(args, results, elapsed, stats)
+
+if __name__ == "__main__":
+    main()
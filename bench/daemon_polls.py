@@ -0,0 +1,84 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+
+from approval_teams import config
+from approval_teams.approver_directory import ApproverDirectory
+from approval_teams.cli import poll_tickets, setup
+from approval_teams.client import ApprovalClient
+from approval_teams.delta_sync import DeltaSync
+from approval_teams.http_client import get_client
+from approval_teams.logs import configure_logging, flush_logs
+from approval_teams.sources import SOURCES
+from bench.benchmark import mock_source
+from bench.mock_server import MockState, start_mock_server
+
+GRAPH_ROUTES = ("create_approval", "list_approvals", "get_approval", "submit_response", "get_operation", "batch")
+
+def run_polls(args):
+
+    # Same path as one --daemon process: a single DeltaSync kept across polls.
+    state = MockState(seed=args.seed)
+    state.seed(existing_approvals=0, uniform_requests=args.tickets, tickets=args.tickets)
+    server, base_url = start_mock_server(state)
+
+    polls = []
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = config.apply({
+            "APPROVAL_STORE_PATH": os.path.join(tmp, "polls.db"),
+            "APPROVER_EMAIL": "approver@example.com",
+            "APPROVER_CACHE_PATH": None,
+            "QUEUE_RETRY_DELAY": 0
+        })
+        try:
+            source = mock_source(args.source, base_url)
+            context = setup(source)
+            graph = get_client(base_url)
+            graph.set_bearer_token("mock-graph-token")
+            context["client"] = ApprovalClient(graph, source, context["store"], ApproverDirectory(graph))
+            sync = DeltaSync(context["store"], source.name)
+            changed = sync.changed
+
+            for _ in range(args.polls):
+                seen = {}
+                sync.changed = lambda tickets: seen.setdefault("changed", changed(tickets))
+                before = state.stats()["requests"]
+                results = poll_tickets(context, sync, threading.Event())
+                after = state.stats()["requests"]
+                polls.append({
+                    "changed": len(seen.get("changed", [])),
+                    "processed": len(results),
+                    "graph_requests": sum(after.get(route, 0) - before.get(route, 0) for route in GRAPH_ROUTES)
+                })
+            context["store"].close()
+        finally:
+            config.apply(previous)
+    server.shutdown()
+    return polls
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Poll the local mock server several times with unchanged tickets and check that only the first poll does any work.")
+    parser.add_argument("--source", choices=sorted(SOURCES), default="uniform-requests")
+    parser.add_argument("--tickets", type=int, default=10)
+    parser.add_argument("--polls", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own output")
+    args = parser.parse_args()
+    if args.verbose:
+        configure_logging()
+
+    polls = run_polls(args)
+    flush_logs()
+    for number, poll in enumerate(polls, 1):
+        print(f"Poll {number}: {poll['changed']} new or changed, {poll['processed']} processed, {poll['graph_requests']} Graph requests")
+
+    repeated = [number for number, poll in enumerate(polls[1:], 2) if poll["changed"] or poll["processed"] or poll["graph_requests"]]
+    if repeated:
+        print(f"Polls {', '.join(map(str, repeated))} found work although no ticket changed", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
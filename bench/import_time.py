@@ -0,0 +1,77 @@
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_MODULES = ["approval_teams.cli", "approval_teams.client"]
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$")
+
+def measure(module):
+
+    # A fresh interpreter each time, so nothing is already in sys.modules.
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True
+    ).stderr
+    imports = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append({"name": name, "self_us": int(self_us), "cumulative_us": int(cumulative_us), "depth": len(indent) // 2})
+    total_us = next((item["cumulative_us"] for item in reversed(imports) if item["name"] == module), 0)
+    return total_us, imports
+
+def heaviest_packages(imports, module, limit):
+
+    # importtime prints children before their parent, so the module's own
+    # subtree is the run of deeper lines just above its depth-0 line.
+    end = max((i for i, item in enumerate(imports) if item["name"] == module and item["depth"] == 0), default=None)
+    if end is None:
+        return []
+    start = end
+    while start > 0 and imports[start - 1]["depth"] > 0:
+        start -= 1
+    totals = {}
+    for item in imports[start:end + 1]:
+        package = item["name"].split(".")[0]
+        totals[package] = totals.get(package, 0) + item["self_us"]
+    return sorted(totals.items(), key=lambda pair: pair[1], reverse=True)[:limit]
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Measure the cold import time of the approval_teams entry points with python -X importtime.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per module; the median is reported")
+    parser.add_argument("--top", type=int, default=8, help="heaviest packages to list, by their own import time")
+    parser.add_argument("--record", help="append the results as a JSON line to this file")
+    parser.add_argument("--max-ms", type=float, help="exit with status 1 if any module's median import time is above this")
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.runs)]
+        median_ms = statistics.median(total for total, _ in runs) / 1000
+        _, imports = runs[-1]
+        results[module] = {"median_ms": round(median_ms, 1), "modules_loaded": len(imports)}
+
+        print(f"{module}: {median_ms:.1f} ms median over {args.runs} runs, {len(imports)} modules")
+        for name, self_us in heaviest_packages(imports, module, args.top):
+            print(f"  {name:<28} {self_us / 1000:8.1f} ms")
+
+    if args.record:
+        with open(args.record, "a") as f:
+            f.write(json.dumps({"timestamp": time.time(), "python": sys.version.split()[0], "results": results}) + "\n")
+        print(f"Recorded to {args.record}")
+
+    if args.max_ms is not None:
+        over = [module for module, result in results.items() if result["median_ms"] > args.max_ms]
+        if over:
+            print(f"Over the {args.max_ms:.0f} ms budget: {', '.join(over)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
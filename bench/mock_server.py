@@ -0,0 +1,414 @@
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+
+ROUTES = [
+    ("GET", re.compile(r"^/v1\.0/users/(?P<email>[^/]+)$"), "get_user"),
+    ("POST", re.compile(r"^/(?P<version>beta|v1\.0)/\$batch$"), "batch"),
+    ("POST", re.compile(r"^/beta/solutions/approval/approvalItems$"), "create_approval"),
+    ("GET", re.compile(r"^/beta/solutions/approval/approvalItems$"), "list_approvals"),
+    ("GET", re.compile(r"^/beta/solutions/approval/approvalItems/(?P<approval_id>[^/]+)$"), "get_approval"),
+    ("POST", re.compile(r"^/beta/solutions/approval/approvalItems/(?P<approval_id>[^/]+)/responses$"), "submit_response"),
+    ("POST", re.compile(r"^/beta/solutions/approval/approvalItems/(?P<approval_id>[^/]+)/cancel$"), "cancel_approval"),
+    ("GET", re.compile(r"^/beta/solutions/approval/operations/(?P<operation_id>[^/]+)$"), "get_operation"),
+    ("POST", re.compile(r"^/(?:beta|v1\.0)/subscriptions$"), "create_subscription"),
+    ("PATCH", re.compile(r"^/(?:beta|v1\.0)/subscriptions/(?P<subscription_id>[^/]+)$"), "renew_subscription"),
+    ("DELETE", re.compile(r"^/(?:beta|v1\.0)/subscriptions/(?P<subscription_id>[^/]+)$"), "delete_subscription"),
+    ("POST", re.compile(r"^/api/mobile/v3\.0/login$"), "login"),
+    ("GET", re.compile(r"^/api/mobile/v3\.0/uniform-requests/all$"), "uniform_requests"),
+    ("GET", re.compile(r"^/tickets$"), "fly_tickets"),
+]
+
+def utc_now():
+
+    return datetime.now(timezone.utc)
+
+class MockState:
+
+    def __init__(self, latency=0.0, page_size=100, consistency_delay=0.0, throttle_rate=0.0, retry_after=1, seed=None, token_lifetime=3600):
+
+        self.latency = latency
+        self.page_size = page_size
+        self.consistency_delay = consistency_delay
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.approvals = []
+        self.approvals_by_id = {}
+        self.operations = {}
+        self.uniform_requests = []
+        self.tickets = []
+        self.subscriptions = {}
+        self.token_lifetime = token_lifetime
+        self.session_tokens = {}
+        self.requests = Counter()
+        self.throttled = Counter()
+
+    def add_approval(self, display_name, description="", created=None):
+
+        approval = {
+            "id": str(uuid.uuid4()),
+            "displayName": display_name,
+            "description": description,
+            "createdDateTime": (created or utc_now()).isoformat(),
+            "state": "pending",
+            "result": None,
+            "visible_at": time.monotonic() + self.consistency_delay,
+            "responses": []
+        }
+        with self.lock:
+            self.approvals.append(approval)
+            self.approvals_by_id[approval["id"]] = approval
+        return approval
+
+    def set_result(self, approval_id, result, state="completed"):
+
+        with self.lock:
+            approval = self.approvals_by_id.get(approval_id)
+            if approval:
+                approval["state"] = state
+                approval["result"] = result
+        if approval:
+            self.notify(approval, "updated")
+        return approval
+
+    def notify(self, approval, change_type):
+
+        # Fake notifier: deliver Graph-shaped change notifications to every subscriber.
+        with self.lock:
+            subscriptions = list(self.subscriptions.values())
+        for subscription in subscriptions:
+            if change_type not in subscription["changeType"].split(","):
+                continue
+            payload = {"value": [{
+                "subscriptionId": subscription["id"],
+                "subscriptionExpirationDateTime": subscription["expirationDateTime"],
+                "clientState": subscription.get("clientState"),
+                "changeType": change_type,
+                "resource": f"solutions/approval/approvalItems('{approval['id']}')",
+                "resourceData": {"@odata.type": "#microsoft.graph.approvalItem", "id": approval["id"]}
+            }]}
+            threading.Thread(target=deliver, args=(subscription["notificationUrl"], payload), daemon=True).start()
+
+    def seed(self, existing_approvals=0, uniform_requests=0, tickets=0):
+
+        created = utc_now() - timedelta(days=30)
+        for i in range(existing_approvals):
+            approval = self.add_approval(f"Historical approval #{i}", created=created + timedelta(seconds=i))
+            approval["visible_at"] = 0
+        for i in range(1, uniform_requests + 1):
+            self.uniform_requests.append({
+                "requestId": i,
+                "technicianName": f"Technician {i % 17}",
+                "notes": f"Uniform sizes for request {i}",
+                "status": "Submitted"
+            })
+        for i in range(1, tickets + 1):
+            self.tickets.append({
+                "id": i,
+                "title": f"Ticket {i}",
+                "description": f"Ticket {i} description",
+                "status": "open"
+            })
+
+    def visible_approvals(self):
+
+        now = time.monotonic()
+        with self.lock:
+            return [a for a in self.approvals if a["visible_at"] <= now]
+
+    def stats(self):
+
+        with self.lock:
+            total = sum(count for route, count in self.requests.items() if route != "batch_sub_request")
+            return {"requests": dict(self.requests), "throttled": dict(self.throttled), "total": total}
+
+def deliver(url, payload):
+
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        urllib.request.urlopen(request, timeout=5).close()
+    except OSError as e:
+        print(f"Mock notifier could not reach {url}: {str(e)}")
+
+def public_approval(approval):
+
+    return {key: value for key, value in approval.items() if key not in ("visible_at", "responses")}
+
+class MockHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+
+        pass
+
+    @property
+    def state(self):
+
+        return self.server.state
+
+    @property
+    def base_url(self):
+
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def do_GET(self):
+
+        self.handle_request("GET")
+
+    def do_POST(self):
+
+        self.handle_request("POST")
+
+    def do_PATCH(self):
+
+        self.handle_request("PATCH")
+
+    def do_DELETE(self):
+
+        self.handle_request("DELETE")
+
+    def handle_request(self, method):
+
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length) if length else b""
+        body = json.loads(raw_body) if raw_body else None
+        status, headers, payload = self.dispatch(method, self.path, body, count=True)
+        self.send_json(status, headers, payload)
+
+    def dispatch(self, method, path, body, count=False):
+
+        parts = urlsplit(path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        for route_method, pattern, name in ROUTES:
+            match = pattern.match(parts.path)
+            if route_method == method and match:
+                break
+        else:
+            return 404, {}, {"error": {"code": "NotFound", "message": f"No route for {method} {parts.path}"}}
+
+        if count:
+            if self.state.latency:
+                time.sleep(self.state.latency)
+            with self.state.lock:
+                self.state.requests[name] += 1
+        if name != "batch" and self.state.throttle_rate and self.state.random.random() < self.state.throttle_rate:
+            with self.state.lock:
+                self.state.throttled[name] += 1
+            return 429, {"Retry-After": str(self.state.retry_after)}, {"error": {"code": "TooManyRequests", "message": "Throttled by mock server"}}
+
+        return getattr(self, f"route_{name}")(body=body, query=query, **match.groupdict())
+
+    def send_json(self, status, headers, payload):
+
+        data = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def route_get_user(self, email, body, query):
+
+        email = unquote(email)
+        return 200, {}, {"id": f"user-{email}", "displayName": email.split("@")[0].title(), "mail": email}
+
+    def route_batch(self, version, body, query):
+
+        responses = []
+        for sub_request in (body or {}).get("requests", []):
+            with self.state.lock:
+                self.state.requests["batch_sub_request"] += 1
+            url = sub_request["url"]
+            url = f"/{version}{url if url.startswith('/') else '/' + url}"
+            status, headers, payload = self.dispatch(sub_request["method"], url, sub_request.get("body"), count=False)
+            responses.append({"id": sub_request["id"], "status": status, "headers": headers, "body": payload})
+        return 200, {}, {"responses": responses}
+
+    def route_create_approval(self, body, query):
+
+        approval = self.state.add_approval(body["displayName"], body.get("description", ""))
+        operation_id = str(uuid.uuid4())
+        with self.state.lock:
+            self.state.operations[operation_id] = approval["id"]
+        self.state.notify(approval, "created")
+        return 202, {"Location": f"{self.base_url}/beta/solutions/approval/operations/{operation_id}"}, None
+
+    def route_get_operation(self, operation_id, body, query):
+
+        with self.state.lock:
+            approval_id = self.state.operations.get(operation_id)
+            approval = self.state.approvals_by_id.get(approval_id)
+        if not approval:
+            return 404, {}, {"error": {"code": "NotFound", "message": "Unknown operation"}}
+        succeeded = approval["visible_at"] <= time.monotonic()
+        return 200, {}, {
+            "id": operation_id,
+            "status": "succeeded" if succeeded else "running",
+            "resourceLocation": f"{self.base_url}/beta/solutions/approval/approvalItems('{approval_id}')" if succeeded else None
+        }
+
+    def route_list_approvals(self, body, query):
+
+        approvals = self.state.visible_approvals()
+        match = re.match(r"^displayName eq '(.*)'$", query.get("$filter", ""))
+        if match:
+            display_name = match.group(1).replace("''", "'")
+            approvals = [a for a in approvals if a["displayName"] == display_name]
+        if query.get("$orderby") == "createdDateTime desc":
+            approvals = sorted(approvals, key=lambda a: a["createdDateTime"], reverse=True)
+        if "$top" in query:
+            approvals = approvals[:int(query["$top"])]
+
+        skip = int(query.get("$skiptoken", 0))
+        page = approvals[skip:skip + self.state.page_size]
+        if "$select" in query:
+            fields = query["$select"].split(",")
+            page = [{key: a.get(key) for key in fields} for a in page]
+        else:
+            page = [public_approval(a) for a in page]
+        payload = {"value": page}
+        if skip + self.state.page_size < len(approvals):
+            next_query = {key: value for key, value in query.items() if key != "$skiptoken"}
+            next_query["$skiptoken"] = str(skip + self.state.page_size)
+            payload["@odata.nextLink"] = f"{self.base_url}/beta/solutions/approval/approvalItems?{urlencode(next_query)}"
+        return 200, {}, payload
+
+    def route_get_approval(self, approval_id, body, query):
+
+        with self.state.lock:
+            approval = self.state.approvals_by_id.get(approval_id)
+        if not approval or approval["visible_at"] > time.monotonic():
+            return 404, {}, {"error": {"code": "NotFound", "message": "Approval not found"}}
+        return 200, {}, public_approval(approval)
+
+    def route_submit_response(self, approval_id, body, query):
+
+        with self.state.lock:
+            approval = self.state.approvals_by_id.get(approval_id)
+            if approval:
+                approval["responses"].append(body)
+        if not approval:
+            return 404, {}, {"error": {"code": "NotFound", "message": "Approval not found"}}
+        self.state.set_result(approval_id, body.get("response"))
+        return 201, {}, {"id": str(uuid.uuid4()), "response": body.get("response"), "comments": body.get("comments")}
+
+    def route_cancel_approval(self, approval_id, body, query):
+
+        if not self.state.set_result(approval_id, None, state="canceled"):
+            return 404, {}, {"error": {"code": "NotFound", "message": "Approval not found"}}
+        return 204, {}, None
+
+    def route_create_subscription(self, body, query):
+
+        # Graph only creates the subscription once the endpoint echoes the validationToken.
+        token = str(uuid.uuid4())
+        url = f"{body['notificationUrl']}{'&' if '?' in body['notificationUrl'] else '?'}validationToken={token}"
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, data=b"", method="POST"), timeout=10) as response:
+                echoed = response.read().decode("utf-8")
+        except OSError as e:
+            echoed = str(e)
+        if echoed != token:
+            return 400, {}, {"error": {"code": "ValidationError", "message": f"Subscription validation request failed: {echoed}"}}
+
+        subscription = {key: body.get(key) for key in ("changeType", "notificationUrl", "resource", "expirationDateTime", "clientState")}
+        subscription["id"] = str(uuid.uuid4())
+        with self.state.lock:
+            self.state.subscriptions[subscription["id"]] = subscription
+        return 201, {}, subscription
+
+    def route_renew_subscription(self, subscription_id, body, query):
+
+        with self.state.lock:
+            subscription = self.state.subscriptions.get(subscription_id)
+            if subscription:
+                subscription["expirationDateTime"] = body["expirationDateTime"]
+        if not subscription:
+            return 404, {}, {"error": {"code": "ResourceNotFound", "message": "Subscription not found"}}
+        return 200, {}, subscription
+
+    def route_delete_subscription(self, subscription_id, body, query):
+
+        with self.state.lock:
+            subscription = self.state.subscriptions.pop(subscription_id, None)
+        if not subscription:
+            return 404, {}, {"error": {"code": "ResourceNotFound", "message": "Subscription not found"}}
+        return 204, {}, None
+
+    def route_login(self, body, query):
+
+        # Unsigned JWT: the client only reads the exp claim.
+        expires = int(time.time() + self.state.token_lifetime)
+        claims = base64.urlsafe_b64encode(json.dumps({"sub": (body or {}).get("username"), "exp": expires}).encode("utf-8")).decode("ascii").rstrip("=")
+        token = f"eyJhbGciOiJub25lIn0.{claims}.{uuid.uuid4().hex}"
+        with self.state.lock:
+            self.state.session_tokens[token] = expires
+        return 200, {}, {"token": token}
+
+    def session_token_valid(self):
+
+        token = (self.headers.get("Authorization") or "").removeprefix("Bearer ")
+        with self.state.lock:
+            return self.state.session_tokens.get(token, 0) > time.time()
+
+    def route_uniform_requests(self, body, query):
+
+        if not self.session_token_valid():
+            return 401, {}, {"status": "ERROR", "message": "Invalid or expired token"}
+        return 200, {}, {"status": "OK", "data": self.state.uniform_requests}
+
+    def route_fly_tickets(self, body, query):
+
+        return 200, {}, self.state.tickets
+
+def start_mock_server(state, host="127.0.0.1", port=0):
+
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.state = state
+    thread = threading.Thread(target=server.serve_forever, name="mock-server", daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Local stand-in for Microsoft Graph approvals and the ticket APIs.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--consistency-delay", type=float, default=0.0, help="seconds before a new approval is visible")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--existing", type=int, default=0, help="pre-existing approvals")
+    parser.add_argument("--uniform-requests", type=int, default=5)
+    parser.add_argument("--tickets", type=int, default=5)
+    args = parser.parse_args()
+
+    state = MockState(args.latency, args.page_size, args.consistency_delay, args.throttle_rate)
+    state.seed(args.existing, args.uniform_requests, args.tickets)
+    server, base_url = start_mock_server(state, port=args.port)
+    print(f"Mock Graph and ticket APIs listening on {base_url}")
+    print(f"Use GRAPH_API_BASE={base_url} API_BASE_URL={base_url} TICKETS_API_URL={base_url}/tickets")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,14 @@
-import requests
-import msal
-import webbrowser
-import os
-from dotenv import load_dotenv
+from approval_teams import ApprovalClient
+from approval_teams.config import APPROVER_EMAIL
+from approval_teams.logs import configure_logging
 
-load_dotenv() 
-
-CLIENT_ID = os.getenv('CLIENT_ID')
-TENANT_ID = os.getenv('TENANT_ID')
-APPROVER_EMAIL = os.getenv('APPROVER_EMAIL')
-
-AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
-SCOPE = ["https://graph.microsoft.com/ApprovalSolution.ReadWrite", "https://graph.microsoft.com/User.Read"]
-GRAPH_API_BASE = "https://graph.microsoft.com"
-
-def get_access_token():
-
-    app = msal.PublicClientApplication(
-        client_id=CLIENT_ID,
-        authority=AUTHORITY
-    )
-    
-    accounts = app.get_accounts()
-    if accounts:
-        result = app.acquire_token_silent(scopes=SCOPE, account=accounts[0])
-        if result and "access_token" in result:
-            return result["access_token"]
-
-    flow = app.initiate_device_flow(scopes=SCOPE)
-    if "user_code" not in flow:
-        raise Exception("Failed to create device flow")
-    
-    print(f"Please go to {flow['verification_uri']} and enter code: {flow['user_code']}")
-    webbrowser.open(flow["verification_uri"])
-    
-    result = app.acquire_token_by_device_flow(flow)
-    if "access_token" in result:
-        return result["access_token"]
-    else:
-        raise Exception(f"Authentication failed: {result.get('error_description', 'Unknown error')}")
-
-def get_user_details(access_token, email):
-
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    response = requests.get(
-        f"{GRAPH_API_BASE}/v1.0/users/{email}",
-        headers=headers,
-        timeout=10
-    )
-    
-    if response.status_code == 200:
-        user_data = response.json()
-        return user_data["id"], user_data.get("displayName", email)
-    else:
-        raise Exception(f"Failed to get user details: {response.status_code} - {response.text}")
+def main():
 
-def create_approval(access_token, approver_id, approver_display_name):
+    configure_logging()
+    client = ApprovalClient.connect()
+    approver_id, approver_display_name = client.directory.resolve(APPROVER_EMAIL)
+    print(f"Found user details for {APPROVER_EMAIL}: ID={approver_id}, DisplayName={approver_display_name}")
 
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
     payload = {
         "displayName": "third Approval",
         "description": "Creating third approval.",
@@ -78,31 +23,11 @@ def create_approval(access_token, approver_id, approver_display_name):
             }
         ]
     }
-    
-    try:
-        response = requests.post(
-            f"{GRAPH_API_BASE}/beta/solutions/approval/approvalItems",
-            headers=headers,
-            json=payload,
-            timeout=10
-        )
-        
-        if response.status_code == 202:
-            print("Approval created successfully!")
-        else:
-            raise Exception(f"Failed to create approval: {response.status_code} - {response.text}")
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Request failed: {str(e)}")
-
-def main():
-
-    access_token = get_access_token()
-    print("Authenticated successfully.")
-    
-    approver_id, approver_display_name = get_user_details(access_token, APPROVER_EMAIL)
-    print(f"Found user details for {APPROVER_EMAIL}: ID={approver_id}, DisplayName={approver_display_name}")
-    
-    create_approval(access_token, approver_id, approver_display_name)
+    response = client.post_approval(payload)
+    if response.status_code == 202:
+        print("Approval created successfully!")
+    else:
+        raise Exception(f"Failed to create approval: {response.status_code} - {response.text}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()